@@ -1,18 +1,24 @@
+from logging import getLogger
+from typing import Dict
+from typing import List
 from typing import Union
 
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi import status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import settings
-from db.dals import UserDAL
+from api.middlewares.server_timing import timed
+from api.models import TokenIntrospection
 from db.models import User
 from db.session import get_db
+from db.session import get_user_dal
 from hashing import Hasher
+from security import decode_access_token
+
+logger = getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/token")
 
@@ -21,15 +27,41 @@ async def _get_user_by_email_for_auth(
     email: str, session: AsyncSession
 ) -> Union[User, None]:
     async with session.begin():
-        user_dal = UserDAL(session)
+        user_dal = get_user_dal(session)
         return await user_dal.get_user_by_email(email=email)
 
 
+async def _get_users_by_emails_for_auth(
+    emails: List[str], session: AsyncSession
+) -> Dict[str, User]:
+    async with session.begin():
+        user_dal = get_user_dal(session)
+        users = await user_dal.get_users_by_emails(emails=emails)
+    return {user.email: user for user in users}
+
+
+def _decode_token(token: str) -> Union[dict, None]:
+    """Returns the claims of a valid token with a subject, otherwise None"""
+    try:
+        with timed("token"):
+            payload = decode_access_token(token)
+    except JWTError:
+        return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+
 async def authenticate_user(email: str, password: str, db: AsyncSession):
-    user = await _get_user_by_email_for_auth(email=email, db=db)
-    if user and Hasher.verify_password(
-        plain_password=password, hashed_password=user.hashed_password
-    ):
+    with timed("auth-db"):
+        user = await _get_user_by_email_for_auth(email=email, session=db)
+    if user is None:
+        return None
+    with timed("hash"):
+        password_is_valid = Hasher.verify_password(
+            plain_password=password, hashed_password=user.hashed_password
+        )
+    if password_is_valid:
         return user
 
 
@@ -40,17 +72,37 @@ async def get_current_user_from_token(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        email: str = payload.get("sub")
-        print("username/email extracted is ", email)
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+    payload = _decode_token(token)
+    if payload is None:
         raise credentials_exception
-    user = await _get_user_by_email_for_auth(email=email, session=db)
+    email: str = payload["sub"]
+    logger.debug("username/email extracted is %s", email)
+    with timed("auth-db"):
+        user = await _get_user_by_email_for_auth(email=email, session=db)
     if user is None:
         raise credentials_exception
     return user
+
+
+async def _introspect_tokens(
+    tokens: List[str], session: AsyncSession
+) -> List[TokenIntrospection]:
+    """Validates tokens like get_current_user_from_token, with one query for all"""
+    payloads = {token: _decode_token(token) for token in set(tokens)}
+    emails = {payload["sub"] for payload in payloads.values() if payload is not None}
+    users = {}
+    if emails:
+        with timed("auth-db"):
+            users = await _get_users_by_emails_for_auth(list(emails), session)
+    introspections = []
+    for token in tokens:
+        payload = payloads[token]
+        if payload is None or payload["sub"] not in users:
+            introspections.append(TokenIntrospection(active=False))
+        else:
+            introspections.append(
+                TokenIntrospection(
+                    active=True, sub=payload["sub"], exp=payload.get("exp")
+                )
+            )
+    return introspections
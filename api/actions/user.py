@@ -1,51 +1,112 @@
+from typing import Tuple
 from typing import Union
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import settings
+from api.cache import user_response_cache
+from api.email_filter import email_availability
+from api.middlewares.server_timing import timed
 from api.models import CreateUser
 from api.models import CreateUserResponse
 from api.models import UpdateUser
-from db.dals import UserDAL
+from api.models import UserStatsResponse
+from db.create_coalescer import user_create_coalescer
 from db.models import User
+from db.session import get_user_dal
 from hashing import Hasher
 
 
 async def _create_new_user(
     body: CreateUser, session: AsyncSession
-) -> CreateUserResponse:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        user = await user_dal.create_user(
-            name=body.name,
-            surname=body.surname,
-            email=body.email,
-            hashed_password=Hasher.get_password_hash(body.password),
-        )
-        return CreateUserResponse(
-            user_id=user.user_id,
-            name=user.name,
-            surname=user.surname,
-            email=user.email,
-            is_active=user.is_active,
-        )
+) -> Union[CreateUserResponse, None]:
+    # check the email first, so that a duplicate signup doesn't pay for bcrypt
+    with timed("db"):
+        async with session.begin():
+            user_dal = get_user_dal(session)
+            if await user_dal.get_user_by_email(email=body.email) is not None:
+                return None
+    with timed("hash"):
+        hashed_password = Hasher.get_password_hash(body.password)
+    with timed("db"):
+        if settings.USER_CREATE_COALESCING_ENABLED:
+            user = await user_create_coalescer.create_user(
+                name=body.name,
+                surname=body.surname,
+                email=body.email,
+                hashed_password=hashed_password,
+            )
+        else:
+            async with session.begin():
+                user_dal = get_user_dal(session)
+                user = await user_dal.create_user(
+                    name=body.name,
+                    surname=body.surname,
+                    email=body.email,
+                    hashed_password=hashed_password,
+                )
+    if user is None:
+        return None
+    email_availability.add(user.email)
+    return CreateUserResponse(
+        user_id=user.user_id,
+        name=user.name,
+        surname=user.surname,
+        email=user.email,
+        is_active=user.is_active,
+    )
 
 
 async def _delete_user(user_id: UUID, session: AsyncSession) -> Union[UUID, None]:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        return await user_dal.delete_user(user_id=user_id)
+    with timed("db"):
+        async with session.begin():
+            user_dal = get_user_dal(session)
+            deleted_user_id = await user_dal.delete_user(user_id=user_id)
+    user_response_cache.invalidate(user_id)
+    return deleted_user_id
 
 
 async def _get_user_by_id(user_id: UUID, session: AsyncSession) -> Union[User, None]:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        return await user_dal.get_user_by_id(user_id=user_id)
+    with timed("db"):
+        async with session.begin():
+            user_dal = get_user_dal(session)
+            return await user_dal.get_user_by_id(user_id=user_id)
+
+
+async def _get_user_with_version_by_id(
+    user_id: UUID, session: AsyncSession
+) -> Union[Tuple[User, int], None]:
+    with timed("db"):
+        async with session.begin():
+            user_dal = get_user_dal(session)
+            return await user_dal.get_user_with_version_by_id(user_id=user_id)
 
 
 async def _update_user(
     user_id: UUID, body: UpdateUser, session: AsyncSession
 ) -> Union[UUID, None]:
-    async with session.begin():
-        user_dal = UserDAL(session)
-        return await user_dal.update_user(user_id=user_id, **body)
+    with timed("db"):
+        async with session.begin():
+            user_dal = get_user_dal(session)
+            updated_user_id = await user_dal.update_user(user_id=user_id, **body)
+    user_response_cache.invalidate(user_id)
+    return updated_user_id
+
+
+async def _get_user_stats(
+    session: AsyncSession, estimate: bool = False
+) -> UserStatsResponse:
+    with timed("db"):
+        async with session.begin():
+            user_dal = get_user_dal(session)
+            if estimate:
+                total, active = await user_dal.estimate_user_stats()
+            else:
+                total, active = await user_dal.get_user_stats()
+    return UserStatsResponse(
+        total=total,
+        active=active,
+        inactive=None if active is None else total - active,
+        estimated=estimate,
+    )
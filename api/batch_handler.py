@@ -0,0 +1,213 @@
+import asyncio
+from logging import getLogger
+from typing import Dict
+from typing import List
+from typing import Union
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import status
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import settings
+from api.actions.auth import get_current_user_from_token
+from api.cache import user_response_cache
+from api.email_filter import email_availability
+from api.middlewares.server_timing import ServerTimingRoute
+from api.middlewares.server_timing import timed
+from api.models import BatchOperation
+from api.models import BatchOperationResult
+from api.models import BatchRequest
+from api.models import BatchResponse
+from api.models import CreateUser
+from api.models import CreateUserResponse
+from api.models import DeleteUserResponse
+from api.models import GetUserResponse
+from api.models import UpdateUser
+from api.models import UpdateUserResponse
+from db.models import User
+from db.repository import UserRepository
+from db.session import get_db
+from db.session import get_user_dal
+from hashing import Hasher
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+batch_router = APIRouter(route_class=ServerTimingRoute)
+
+###################################
+# BLOCK FOR BATCHES OF OPERATIONS #
+###################################
+
+batch_operations = metrics.counter(
+    "batch_operations_total", "Operations run by batches by the method and the status"
+)
+
+# a create pays for bcrypt, the others for a statement or two
+OPERATION_COSTS = {"get": 1, "delete": 2, "update": 2, "create": 10}
+
+
+class _BatchRolledBack(Exception):
+    pass
+
+
+def _error(status_code: int, detail) -> BatchOperationResult:
+    return BatchOperationResult(status=status_code, body={"detail": detail})
+
+
+def _validate(
+    operation: BatchOperation,
+) -> Union[CreateUser, Dict, BatchOperationResult, None]:
+    """Parses the body of the operation, or returns the error of it"""
+    try:
+        if operation.method == "create":
+            return CreateUser(**operation.body)
+        if operation.method == "update":
+            changes = UpdateUser(**operation.body).dict(exclude_none=True)
+            if not changes:
+                return _error(
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    "At least one parameter for user update info should be provided.",
+                )
+            return changes
+    except ValidationError as err:
+        return _error(status.HTTP_422_UNPROCESSABLE_ENTITY, err.errors())
+    except HTTPException as err:
+        return _error(err.status_code, err.detail)
+
+
+async def _run(
+    operation: BatchOperation,
+    params: Union[CreateUser, Dict, None],
+    hashed_password: Union[str, None],
+    user_dal: UserRepository,
+) -> BatchOperationResult:
+    not_found = _error(
+        status.HTTP_404_NOT_FOUND, f"User with id {operation.user_id} not found."
+    )
+    if operation.method == "create":
+        user = await user_dal.create_user(
+            name=params.name,
+            surname=params.surname,
+            email=params.email,
+            hashed_password=hashed_password,
+        )
+        if user is None:
+            return _error(
+                status.HTTP_409_CONFLICT,
+                f"User with email {params.email} already exists.",
+            )
+        content = CreateUserResponse.from_orm(user)
+    elif operation.method == "get":
+        # read from the transaction, earlier operations may have changed the user
+        user = await user_dal.get_user_by_id(operation.user_id)
+        if user is None:
+            return not_found
+        content = GetUserResponse.from_orm(user)
+    elif operation.method == "update":
+        updated_user_id = await user_dal.update_user(operation.user_id, **params)
+        if updated_user_id is None:
+            return not_found
+        content = UpdateUserResponse(updated_user_id=updated_user_id)
+    else:
+        deleted_user_id = await user_dal.delete_user(operation.user_id)
+        if deleted_user_id is None:
+            return not_found
+        content = DeleteUserResponse(deleted_user_id=deleted_user_id)
+    return BatchOperationResult(
+        status=status.HTTP_200_OK, body=jsonable_encoder(content)
+    )
+
+
+async def _hash_passwords(params: List) -> List[Union[str, None]]:
+    # bcrypt releases the GIL, so the passwords of a batch are hashed in parallel
+    return await asyncio.gather(
+        *(
+            asyncio.to_thread(Hasher.get_password_hash, param.password)
+            if isinstance(param, CreateUser)
+            else asyncio.sleep(0)
+            for param in params
+        )
+    )
+
+
+@batch_router.post("/", response_model=BatchResponse)
+async def run_batch(
+    body: BatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+) -> BatchResponse:
+    """Runs the operations in order in one transaction, each in a savepoint
+
+    A failed operation is rolled back alone, or with the whole batch when the
+    batch is atomic. Passwords are hashed before the transaction begins.
+    """
+    cost = sum(OPERATION_COSTS[operation.method] for operation in body.operations)
+    if cost > settings.BATCH_MAX_COST:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch costs {cost}, at most {settings.BATCH_MAX_COST} is allowed.",
+        )
+    params = [_validate(operation) for operation in body.operations]
+    results: List[Union[BatchOperationResult, None]] = [
+        param if isinstance(param, BatchOperationResult) else None for param in params
+    ]
+    if body.atomic and any(results):
+        return _finish(body, results, rolled_back=True)
+    with timed("hash"):
+        hashed_passwords = await _hash_passwords(params)
+    try:
+        with timed("db"):
+            async with db.begin():
+                user_dal = get_user_dal(db)
+                for index, operation in enumerate(body.operations):
+                    if results[index] is not None:
+                        continue
+                    try:
+                        async with db.begin_nested():
+                            results[index] = await _run(
+                                operation,
+                                params[index],
+                                hashed_passwords[index],
+                                user_dal,
+                            )
+                    except IntegrityError as err:
+                        logger.error(err)
+                        results[index] = _error(
+                            status.HTTP_503_SERVICE_UNAVAILABLE,
+                            f"Database error: {err}",
+                        )
+                    if body.atomic and results[index].status >= 400:
+                        raise _BatchRolledBack()
+    except _BatchRolledBack:
+        return _finish(body, results, rolled_back=True)
+    return _finish(body, results, rolled_back=False)
+
+
+def _finish(
+    body: BatchRequest,
+    results: List[Union[BatchOperationResult, None]],
+    rolled_back: bool,
+) -> BatchResponse:
+    for index, operation in enumerate(body.operations):
+        result = results[index]
+        if rolled_back and (result is None or result.status < 400):
+            # the operation didn't fail, but the failure of another undid it
+            result = results[index] = _error(
+                status.HTTP_424_FAILED_DEPENDENCY,
+                "Batch was rolled back as another operation failed.",
+            )
+        batch_operations.inc(method=operation.method, status=str(result.status))
+        if result.status != status.HTTP_200_OK:
+            continue
+        # the changes are committed, so the caches can learn about them
+        if operation.method in ("update", "delete"):
+            user_response_cache.invalidate(operation.user_id)
+        elif operation.method == "create":
+            email_availability.add(result.body["email"])
+    return BatchResponse(results=results)
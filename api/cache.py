@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import NamedTuple
+from typing import Union
+from uuid import UUID
+
+import settings
+
+############################################
+# BLOCK WITH CACHE OF SERIALIZED RESPONSES #
+############################################
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    content: bytes
+
+
+def etag_matches(etag: str, if_none_match: Union[str, None]) -> bool:
+    """Checks the If-None-Match header value against the entity tag"""
+    if if_none_match is None:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class UserResponseCache:
+    """Bounded LRU cache of serialized user responses keyed by user_id"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.generation = 0
+        self._responses: OrderedDict[UUID, CachedResponse] = OrderedDict()
+
+    def get(self, user_id: UUID) -> Union[CachedResponse, None]:
+        response = self._responses.get(user_id)
+        if response is not None:
+            self._responses.move_to_end(user_id)
+        return response
+
+    def put(self, user_id: UUID, response: CachedResponse, generation: int) -> None:
+        """Stores the response unless an invalidation happened since `generation`
+
+        The generation is read before the row is loaded from the database, so
+        a response built from a row that was changed meanwhile is not cached.
+        """
+        if generation != self.generation:
+            return
+        self._responses[user_id] = response
+        self._responses.move_to_end(user_id)
+        while len(self._responses) > self.max_size:
+            self._responses.popitem(last=False)
+
+    def invalidate(self, user_id: UUID) -> None:
+        self.generation += 1
+        self._responses.pop(user_id, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._responses.clear()
+
+
+user_response_cache = UserResponseCache(max_size=settings.USER_RESPONSE_CACHE_SIZE)
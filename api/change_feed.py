@@ -0,0 +1,173 @@
+import asyncio
+import json
+from collections import deque
+from logging import getLogger
+from typing import AsyncIterator
+from typing import Callable
+from typing import NamedTuple
+from typing import Union
+from uuid import uuid4
+
+import asyncpg
+
+import settings
+from db.dals import USER_CHANGES_CHANNEL
+
+logger = getLogger(__name__)
+
+###################################
+# BLOCK WITH FEED OF USER CHANGES #
+###################################
+
+
+class ChangeEvent(NamedTuple):
+    sequence: int
+    event_id: str
+    name: str
+    data: str
+
+
+class Subscriber:
+    def __init__(self, buffer_size: int):
+        # None in the queue tells the stream to end
+        self.queue: asyncio.Queue[Union[ChangeEvent, None]] = asyncio.Queue(
+            maxsize=buffer_size
+        )
+
+
+class UserChangeFeed:
+    """Fans out postgres NOTIFY events about users to SSE subscribers
+
+    A single LISTEN connection is opened per worker on the first subscription.
+    Event ids are "<epoch>-<sequence>", where the epoch identifies the listener,
+    so a subscriber reconnecting with Last-Event-ID is replayed the events it
+    missed from the bounded history, or is told to resync with a reset event
+    when they are no longer there.
+    """
+
+    def __init__(self, dsn: str, buffer_size: int, history_size: int):
+        self.dsn = dsn
+        self.buffer_size = buffer_size
+        self.epoch = uuid4().hex[:8]
+        self._sequence = 0
+        self._history: deque[ChangeEvent] = deque(maxlen=history_size)
+        self._subscribers: set[Subscriber] = set()
+        self._observers: list[Callable[[dict], None]] = []
+        self._connection: Union[asyncpg.Connection, None] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._connection is not None and not self._connection.is_closed():
+                return
+            self._connection = await asyncpg.connect(self.dsn)
+            self._connection.add_termination_listener(self._on_termination)
+            await self._connection.add_listener(
+                USER_CHANGES_CHANNEL, self._on_notification
+            )
+
+    async def stop(self) -> None:
+        async with self._lock:
+            if self._connection is not None:
+                self._connection.remove_termination_listener(self._on_termination)
+                await self._connection.close()
+                self._connection = None
+        self._close_subscribers()
+
+    def add_observer(self, observer: Callable[[dict], None]) -> None:
+        """Registers a callback invoked in process with every change"""
+        self._observers.append(observer)
+
+    async def subscribe(self, last_event_id: Union[str, None] = None) -> Subscriber:
+        await self.start()
+        return self.attach(last_event_id)
+
+    def attach(self, last_event_id: Union[str, None] = None) -> Subscriber:
+        subscriber = Subscriber(self.buffer_size)
+        self._subscribers.add(subscriber)
+        if last_event_id is not None:
+            for event in self._missed_events(last_event_id):
+                self._deliver(subscriber, event)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def dispatch(self, payload: str) -> None:
+        change = json.loads(payload)
+        for observer in self._observers:
+            observer(change)
+        self._sequence += 1
+        event = ChangeEvent(
+            sequence=self._sequence,
+            event_id=f"{self.epoch}-{self._sequence}",
+            name=change["operation"],
+            data=payload,
+        )
+        self._history.append(event)
+        for subscriber in list(self._subscribers):
+            self._deliver(subscriber, event)
+
+    def _missed_events(self, last_event_id: str) -> list[ChangeEvent]:
+        epoch, _, sequence = last_event_id.partition("-")
+        oldest_sequence = self._history[0].sequence if self._history else 1
+        if (
+            epoch != self.epoch
+            or not sequence.isdigit()
+            or int(sequence) < oldest_sequence - 1
+        ):
+            return [ChangeEvent(0, f"{self.epoch}-{self._sequence}", "reset", "{}")]
+        return [event for event in self._history if event.sequence > int(sequence)]
+
+    def _deliver(self, subscriber: Subscriber, event: ChangeEvent) -> None:
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the slow subscriber is disconnected, it resumes from its last id
+            logger.warning("Change feed subscriber overflowed, disconnecting it")
+            self._close_subscriber(subscriber)
+
+    def _close_subscriber(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def _close_subscribers(self) -> None:
+        for subscriber in list(self._subscribers):
+            self._close_subscriber(subscriber)
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self.dispatch(payload)
+
+    def _on_termination(self, connection) -> None:
+        logger.error("Change feed LISTEN connection was lost")
+        self._connection = None
+        self._close_subscribers()
+
+
+async def stream_events(
+    feed: UserChangeFeed, subscriber: Subscriber, heartbeat: float
+) -> AsyncIterator[str]:
+    """Renders the events of the subscriber as a text/event-stream"""
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                break
+            yield (
+                f"id: {event.event_id}\nevent: {event.name}\n" f"data: {event.data}\n\n"
+            )
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+user_change_feed = UserChangeFeed(
+    dsn="".join(settings.REAL_DATABASE_URL.split("+asyncpg")),
+    buffer_size=settings.USER_CHANGES_BUFFER_SIZE,
+    history_size=settings.USER_CHANGES_HISTORY_SIZE,
+)
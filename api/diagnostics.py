@@ -0,0 +1,141 @@
+import gc
+import resource
+import tracemalloc
+from collections import Counter
+from collections import OrderedDict
+from itertools import count
+from typing import Dict
+from typing import List
+from typing import Union
+
+import settings
+from api.models import AllocationSite
+from api.models import GcStatsResponse
+from api.models import MemorySnapshotResponse
+from api.models import MemoryTracingResponse
+
+####################################
+# BLOCK WITH DIAGNOSTICS OF MEMORY #
+####################################
+
+# allocations of the tracing and of the import machinery are noise
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _site(statistic) -> AllocationSite:
+    frame = statistic.traceback[0]
+    return AllocationSite(
+        file=frame.filename,
+        line=frame.lineno,
+        size=statistic.size,
+        count=statistic.count,
+        size_diff=getattr(statistic, "size_diff", None),
+        count_diff=getattr(statistic, "count_diff", None),
+        traceback=statistic.traceback.format()
+        if len(statistic.traceback) > 1
+        else None,
+    )
+
+
+class MemoryDiagnostics:
+    """Starts and stops tracemalloc and keeps the last snapshots for diffing
+
+    Nothing is traced until tracing is started, so a worker only pays for
+    tracemalloc while it is being diagnosed. Snapshots are dropped, the
+    oldest first, once more than `max_snapshots` are kept.
+    """
+
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._snapshot_ids = count(1)
+
+    def tracing(self) -> MemoryTracingResponse:
+        return MemoryTracingResponse(
+            tracing=tracemalloc.is_tracing(),
+            frames=tracemalloc.get_traceback_limit(),
+            snapshot_ids=list(self._snapshots),
+        )
+
+    def start(self, frames: int) -> MemoryTracingResponse:
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+            # the traces so far have other depths, so they can't be compared
+            self.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.tracing()
+
+    def stop(self) -> MemoryTracingResponse:
+        tracemalloc.stop()
+        self._snapshots.clear()
+        return self.tracing()
+
+    def take_snapshot(self, top: int) -> Union[MemorySnapshotResponse, None]:
+        """Returns None when tracing isn't started"""
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        snapshot_id = next(self._snapshot_ids)
+        self._snapshots[snapshot_id] = snapshot
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+        return self._describe(snapshot_id, snapshot, top)
+
+    def get_snapshot(
+        self, snapshot_id: int, top: int
+    ) -> Union[MemorySnapshotResponse, None]:
+        snapshot = self._snapshots.get(snapshot_id)
+        if snapshot is not None:
+            return self._describe(snapshot_id, snapshot, top)
+
+    @staticmethod
+    def _group_by(snapshot: tracemalloc.Snapshot) -> str:
+        return "traceback" if snapshot.traceback_limit > 1 else "lineno"
+
+    def _describe(
+        self, snapshot_id: int, snapshot: tracemalloc.Snapshot, top: int
+    ) -> MemorySnapshotResponse:
+        statistics = snapshot.statistics(self._group_by(snapshot))
+        current, peak = tracemalloc.get_traced_memory()
+        return MemorySnapshotResponse(
+            snapshot_id=snapshot_id,
+            traced_size=sum(statistic.size for statistic in statistics),
+            traced_current=current,
+            traced_peak=peak,
+            top=[_site(statistic) for statistic in statistics[:top]],
+        )
+
+    def diff(
+        self, base_id: int, snapshot_id: int, top: int
+    ) -> Union[List[AllocationSite], None]:
+        """Sites sorted by how much they grew since the base snapshot"""
+        base = self._snapshots.get(base_id)
+        snapshot = self._snapshots.get(snapshot_id)
+        if base is None or snapshot is None:
+            return None
+        statistics = snapshot.compare_to(base, self._group_by(snapshot))
+        return [_site(statistic) for statistic in statistics[:top]]
+
+
+def gc_stats(top: int) -> GcStatsResponse:
+    """Collector state and the most numerous types of the tracked objects"""
+    objects_by_type: Dict[str, int] = Counter(
+        type(obj).__qualname__ for obj in gc.get_objects()
+    )
+    return GcStatsResponse(
+        counts=list(gc.get_count()),
+        thresholds=list(gc.get_threshold()),
+        generations=gc.get_stats(),
+        uncollectable=len(gc.garbage),
+        # kilobytes on Linux
+        max_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        objects_by_type=dict(objects_by_type.most_common(top)),
+    )
+
+
+memory_diagnostics = MemoryDiagnostics(max_snapshots=settings.DIAGNOSTICS_MAX_SNAPSHOTS)
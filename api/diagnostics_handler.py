@@ -0,0 +1,107 @@
+import asyncio
+import hmac
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import Query
+from fastapi import Request
+from fastapi import status
+
+import settings
+from api.diagnostics import gc_stats
+from api.diagnostics import memory_diagnostics
+from api.models import GcStatsResponse
+from api.models import MemoryDiffResponse
+from api.models import MemorySnapshotResponse
+from api.models import MemoryTracingResponse
+
+####################################
+# BLOCK WITH DIAGNOSTICS ENDPOINTS #
+####################################
+
+
+def authorize_diagnostics(request: Request) -> None:
+    """Lets through requests carrying the diagnostics token, none without a token"""
+    token = request.headers.get(settings.DIAGNOSTICS_HEADER, "")
+    if not settings.DIAGNOSTICS_TOKEN or not hmac.compare_digest(
+        token.encode(), settings.DIAGNOSTICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Diagnostics token is missing or wrong.",
+        )
+
+
+diagnostics_router = APIRouter(dependencies=[Depends(authorize_diagnostics)])
+
+TopQuery = Query(20, ge=1, le=500)
+
+
+def _tracing_not_started() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Memory tracing is not started.",
+    )
+
+
+def _snapshot_not_found(snapshot_id: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Snapshot with id {snapshot_id} not found.",
+    )
+
+
+@diagnostics_router.get("/memory", response_model=MemoryTracingResponse)
+async def get_memory_tracing() -> MemoryTracingResponse:
+    return memory_diagnostics.tracing()
+
+
+@diagnostics_router.post("/memory/start", response_model=MemoryTracingResponse)
+async def start_memory_tracing(
+    frames: int = Query(1, ge=1, le=100)
+) -> MemoryTracingResponse:
+    return memory_diagnostics.start(frames)
+
+
+@diagnostics_router.post("/memory/stop", response_model=MemoryTracingResponse)
+async def stop_memory_tracing() -> MemoryTracingResponse:
+    return memory_diagnostics.stop()
+
+
+@diagnostics_router.post("/memory/snapshots", response_model=MemorySnapshotResponse)
+async def take_memory_snapshot(top: int = TopQuery) -> MemorySnapshotResponse:
+    snapshot = await asyncio.to_thread(memory_diagnostics.take_snapshot, top)
+    if snapshot is None:
+        raise _tracing_not_started()
+    return snapshot
+
+
+@diagnostics_router.get(
+    "/memory/snapshots/{snapshot_id}", response_model=MemorySnapshotResponse
+)
+async def get_memory_snapshot(
+    snapshot_id: int, top: int = TopQuery
+) -> MemorySnapshotResponse:
+    snapshot = await asyncio.to_thread(
+        memory_diagnostics.get_snapshot, snapshot_id, top
+    )
+    if snapshot is None:
+        raise _snapshot_not_found(snapshot_id)
+    return snapshot
+
+
+@diagnostics_router.get("/memory/diff", response_model=MemoryDiffResponse)
+async def diff_memory_snapshots(
+    base_id: int, snapshot_id: int, top: int = TopQuery
+) -> MemoryDiffResponse:
+    sites = await asyncio.to_thread(memory_diagnostics.diff, base_id, snapshot_id, top)
+    if sites is None:
+        snapshot_ids = memory_diagnostics.tracing().snapshot_ids
+        raise _snapshot_not_found(snapshot_id if base_id in snapshot_ids else base_id)
+    return MemoryDiffResponse(base_id=base_id, snapshot_id=snapshot_id, top=sites)
+
+
+@diagnostics_router.get("/gc", response_model=GcStatsResponse)
+async def get_gc_stats(top: int = TopQuery) -> GcStatsResponse:
+    return await asyncio.to_thread(gc_stats, top)
@@ -0,0 +1,107 @@
+import hashlib
+import math
+from logging import getLogger
+from typing import Callable
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from api.middlewares.server_timing import timed
+from db.session import get_sessionmaker
+from db.session import get_user_dal
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+###########################################
+# BLOCK WITH BLOOM FILTER OF TAKEN EMAILS #
+###########################################
+
+email_checks = metrics.counter(
+    "email_availability_checks_total", "Email availability checks by the outcome"
+)
+
+
+class BloomFilter:
+    """Set membership with false positives but without false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        # double hashing derives all the positions from two hashes
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class EmailAvailability:
+    """Answers whether an email is free, mostly without touching the database
+
+    The filter holds every taken email, so an email missing from it is free.
+    Until the filter is loaded every check goes to the database.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ready = False
+        self._filter = BloomFilter(capacity, error_rate)
+
+    def add(self, email: str) -> None:
+        self._filter.add(email)
+
+    async def load(
+        self,
+        session_factory: Callable[[], sessionmaker] = get_sessionmaker,
+        batch_size: int = 10000,
+    ) -> bool:
+        """Adds all taken emails, emails taken meanwhile are added by `add`"""
+        try:
+            async with session_factory()() as session, session.begin():
+                async for email in get_user_dal(session).iter_emails(batch_size):
+                    self._filter.add(email)
+        except (OSError, SQLAlchemyError) as err:
+            logger.error(f"Loading of taken emails failed: {err}")
+            return False
+        self.ready = True
+        return True
+
+    def reset(self) -> None:
+        self.ready = False
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+
+    async def is_available(self, email: str, session: AsyncSession) -> bool:
+        if self.ready and email not in self._filter:
+            email_checks.inc(outcome="filtered")
+            return True
+        with timed("db"):
+            async with session.begin():
+                user = await get_user_dal(session).get_user_by_email(email=email)
+        if user is None:
+            email_checks.inc(outcome="false_positive" if self.ready else "unloaded")
+            return True
+        email_checks.inc(outcome="taken")
+        return False
+
+
+email_availability = EmailAvailability(
+    capacity=settings.EMAIL_FILTER_CAPACITY,
+    error_rate=settings.EMAIL_FILTER_ERROR_RATE,
+)
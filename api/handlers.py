@@ -1,44 +1,138 @@
 from logging import getLogger
+from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter
 from fastapi import Depends
+from fastapi import Header
 from fastapi import HTTPException
 from fastapi import status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
+from pydantic import EmailStr
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import settings
 from api.actions.auth import get_current_user_from_token
 from api.actions.user import _create_new_user
 from api.actions.user import _delete_user
-from api.actions.user import _get_user_by_id
+from api.actions.user import _get_user_stats
+from api.actions.user import _get_user_with_version_by_id
 from api.actions.user import _update_user
+from api.cache import CachedResponse
+from api.cache import etag_matches
+from api.cache import user_response_cache
+from api.change_feed import stream_events
+from api.change_feed import user_change_feed
+from api.email_filter import email_availability
+from api.idempotency import idempotency_store
+from api.idempotency import request_fingerprint
+from api.idempotency import StoredResponse
+from api.middlewares.server_timing import ServerTimingRoute
+from api.middlewares.server_timing import timed
 from api.models import CreateUser
 from api.models import CreateUserResponse
 from api.models import DeleteUserResponse
+from api.models import EmailAvailabilityResponse
 from api.models import GetUserResponse
 from api.models import UpdateUser
 from api.models import UpdateUserResponse
+from api.models import UserStatsResponse
 from db.models import User
 from db.session import get_db
 
 logger = getLogger(__name__)
 
-user_router = APIRouter()
+user_router = APIRouter(route_class=ServerTimingRoute)
 
+# changes made by other workers arrive through the feed and evict cached responses
+user_change_feed.add_observer(
+    lambda change: user_response_cache.invalidate(UUID(change["user_id"]))
+)
 
-@user_router.post("/", response_model=CreateUserResponse)
-async def create_user(
-    body: CreateUser, db: AsyncSession = Depends(get_db)
+
+# and tell about emails they took
+def _add_taken_email(change: dict) -> None:
+    if "email" in change:
+        email_availability.add(change["email"])
+
+
+user_change_feed.add_observer(_add_taken_email)
+
+
+async def _create_user_or_conflict(
+    body: CreateUser, db: AsyncSession
 ) -> CreateUserResponse:
     try:
-        return await _create_new_user(body, db)
+        user = await _create_new_user(body, db)
     except IntegrityError as err:
         logger.error(err)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Database error: {err}",
         )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"User with email {body.email} already exists.",
+        )
+    return user
+
+
+@user_router.post("/", response_model=CreateUserResponse)
+async def create_user(
+    body: CreateUser,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
+) -> CreateUserResponse:
+    if idempotency_key is None:
+        return await _create_user_or_conflict(body, db)
+    fingerprint = request_fingerprint(body)
+    stored_response = idempotency_store.get(idempotency_key)
+    if stored_response is not None:
+        if stored_response.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for another request.",
+            )
+        return JSONResponse(
+            status_code=stored_response.status_code,
+            content=stored_response.content,
+            headers={"Idempotent-Replayed": "true"},
+        )
+    if not idempotency_store.begin(idempotency_key):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Request with this Idempotency-Key is already in progress.",
+        )
+    try:
+        user = await _create_user_or_conflict(body, db)
+    except HTTPException as err:
+        if err.status_code == status.HTTP_409_CONFLICT:
+            idempotency_store.save(
+                idempotency_key,
+                StoredResponse(fingerprint, err.status_code, {"detail": err.detail}),
+            )
+        raise
+    finally:
+        idempotency_store.release(idempotency_key)
+    idempotency_store.save(
+        idempotency_key,
+        StoredResponse(fingerprint, status.HTTP_200_OK, jsonable_encoder(user)),
+    )
+    return user
+
+
+@user_router.get("/email-availability", response_model=EmailAvailabilityResponse)
+async def check_email_availability(
+    email: EmailStr, db: AsyncSession = Depends(get_db)
+) -> EmailAvailabilityResponse:
+    return EmailAvailabilityResponse(
+        email=email, available=await email_availability.is_available(email, db)
+    )
 
 
 @user_router.delete("/", response_model=DeleteUserResponse)
@@ -59,24 +153,47 @@ async def delete_user(
 @user_router.get("/", response_model=GetUserResponse)
 async def get_user_by_id(
     user_id: UUID,
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user_from_token),
-) -> GetUserResponse:
-    user = await _get_user_by_id(user_id, db)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with id {user_id} not found.",
+) -> Response:
+    cached_response = user_response_cache.get(user_id)
+    if cached_response is None:
+        generation = user_response_cache.generation
+        user_with_version = await _get_user_with_version_by_id(user_id, db)
+        if user_with_version is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User with id {user_id} not found.",
+            )
+        user, version = user_with_version
+        with timed("serialize"):
+            cached_response = CachedResponse(
+                etag=f'"{version}"',
+                content=GetUserResponse.from_orm(user).json().encode(),
+            )
+        user_response_cache.put(user_id, cached_response, generation)
+    if etag_matches(cached_response.etag, if_none_match):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": cached_response.etag},
         )
-    return GetUserResponse(
-        user_id=user.user_id,
-        name=user.name,
-        surname=user.surname,
-        email=user.email,
-        is_active=user.is_active,
+    return Response(
+        content=cached_response.content,
+        media_type="application/json",
+        headers={"ETag": cached_response.etag},
     )
 
 
+@user_router.get("/stats", response_model=UserStatsResponse)
+async def get_user_stats(
+    estimate: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+) -> UserStatsResponse:
+    return await _get_user_stats(db, estimate)
+
+
 @user_router.patch("/", response_model=UpdateUserResponse)
 async def update_user(
     user_id: UUID,
@@ -104,3 +221,18 @@ async def update_user(
             detail=f"User with id {user_id} not found.",
         )
     return UpdateUserResponse(updated_user_id=updated_user_id)
+
+
+@user_router.get("/changes")
+async def stream_user_changes(
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user_from_token),
+) -> StreamingResponse:
+    subscriber = await user_change_feed.subscribe(last_event_id)
+    return StreamingResponse(
+        stream_events(
+            user_change_feed, subscriber, settings.USER_CHANGES_HEARTBEAT_SECONDS
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from fastapi import Request
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+############################
+# BLOCK WITH HEALTH CHECKS #
+############################
+
+health_router = APIRouter()
+
+
+@health_router.get("/live")
+async def live() -> dict:
+    return {"status": "alive"}
+
+
+@health_router.get("/ready")
+async def ready(request: Request) -> JSONResponse:
+    """Reports ready only after the database pool has been warmed up"""
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "starting"},
+        )
+    return JSONResponse(content={"status": "ready"})
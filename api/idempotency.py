@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any
+from typing import NamedTuple
+from typing import Union
+
+from pydantic import BaseModel
+
+import settings
+
+#####################################################
+# BLOCK FOR REPLAYING RESPONSES OF RETRIED REQUESTS #
+#####################################################
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    content: Any
+
+
+def request_fingerprint(body: BaseModel) -> str:
+    """Digest of the request body, so a reused key with another body is detected"""
+    return sha256(body.json(sort_keys=True).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Bounded LRU store of responses keyed by the Idempotency-Key header"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._responses: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._in_flight: set[str] = set()
+
+    def get(self, key: str) -> Union[StoredResponse, None]:
+        response = self._responses.get(key)
+        if response is not None:
+            self._responses.move_to_end(key)
+        return response
+
+    def begin(self, key: str) -> bool:
+        """Mark the key as in flight, returns False if it already is"""
+        if key in self._in_flight:
+            return False
+        self._in_flight.add(key)
+        return True
+
+    def save(self, key: str, response: StoredResponse) -> None:
+        self._responses[key] = response
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_size:
+            self._responses.popitem(last=False)
+
+    def release(self, key: str) -> None:
+        self._in_flight.discard(key)
+
+    def clear(self) -> None:
+        self._responses.clear()
+        self._in_flight.clear()
+
+
+idempotency_store = IdempotencyStore(max_size=settings.IDEMPOTENCY_STORE_SIZE)
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from datetime import timedelta
+from logging import getLogger
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Union
+from uuid import UUID
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from api.cache import user_response_cache
+from db.jobs import JobDAL
+from db.models import Job
+from db.session import get_sessionmaker
+from db.session import get_user_dal
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+##################################
+# BLOCK WITH WORKERS OF THE JOBS #
+##################################
+
+jobs_finished = metrics.counter(
+    "jobs_finished_total", "Job attempts finished by the type and the outcome"
+)
+job_duration_seconds = metrics.histogram(
+    "job_duration_seconds",
+    "Duration of job attempts",
+    buckets=[0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800],
+)
+job_items_processed = metrics.counter(
+    "job_items_processed_total", "Users processed by jobs, the rate is the throughput"
+)
+jobs_running = metrics.gauge("jobs_running", "Jobs running in this worker")
+
+# job handler gets the payload and the progress of earlier attempts,
+# and reports the progress after each committed chunk
+JobHandler = Callable[
+    [dict, dict, Callable[[dict], Awaitable[None]], sessionmaker], Awaitable[dict]
+]
+
+
+async def _process_users_in_chunks(
+    payload: dict,
+    progress: dict,
+    report_progress: Callable[[dict], Awaitable[None]],
+    session_factory: sessionmaker,
+    operation: Callable[..., Awaitable[List[UUID]]],
+) -> dict:
+    """Applies the operation to chunks of the user ids, each in a transaction"""
+    user_ids = [UUID(user_id) for user_id in payload["user_ids"]]
+    processed = progress.get("processed", 0)
+    affected = progress.get("affected", 0)
+    chunk_size = settings.JOB_CHUNK_SIZE
+    while processed < len(user_ids):
+        chunk = user_ids[processed : processed + chunk_size]  # noqa: E203
+        async with session_factory() as session, session.begin():
+            affected_user_ids = await operation(get_user_dal(session), chunk)
+        for user_id in affected_user_ids:
+            user_response_cache.invalidate(user_id)
+        processed += len(chunk)
+        affected += len(affected_user_ids)
+        job_items_processed.inc(len(chunk))
+        await report_progress({"processed": processed, "affected": affected})
+    return {"processed": processed, "affected": affected}
+
+
+async def deactivate_users(payload, progress, report_progress, session_factory):
+    return await _process_users_in_chunks(
+        payload,
+        progress,
+        report_progress,
+        session_factory,
+        lambda user_dal, user_ids: user_dal.delete_users(user_ids),
+    )
+
+
+async def update_users(payload, progress, report_progress, session_factory):
+    return await _process_users_in_chunks(
+        payload,
+        progress,
+        report_progress,
+        session_factory,
+        lambda user_dal, user_ids: user_dal.update_users(
+            user_ids, **payload["changes"]
+        ),
+    )
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    "deactivate_users": deactivate_users,
+    "update_users": update_users,
+}
+
+
+class JobWorkerPool:
+    """Runs queued jobs with a fixed number of workers in this process
+
+    Workers poll the jobs table and also wake up at once when a job is
+    submitted through this process. Failed attempts are retried with a
+    growing delay until the job runs out of attempts.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        poll_interval: float,
+        lease: float,
+        retry_delay: float,
+        session_factory: Callable[[], sessionmaker] = get_sessionmaker,
+    ):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.retry_delay = retry_delay
+        self.session_factory = session_factory
+        self._tasks: List[asyncio.Task] = []
+        self._job_submitted: Union[asyncio.Event, None] = None
+
+    def notify_submitted(self) -> None:
+        if self._job_submitted is not None:
+            self._job_submitted.set()
+
+    async def _claim(self) -> Union[Job, None]:
+        async with self.session_factory()() as session, session.begin():
+            return await JobDAL(session).claim_job(self.lease)
+
+    async def _report_progress(self, job_id: UUID, progress: dict) -> None:
+        async with self.session_factory()() as session, session.begin():
+            await JobDAL(session).save_progress(job_id, progress, self.lease)
+
+    async def run_job(self, job: Job) -> None:
+        started_at = time.perf_counter()
+        jobs_running.inc()
+        try:
+            progress = await JOB_HANDLERS[job.job_type](
+                job.payload,
+                job.progress,
+                lambda progress: self._report_progress(job.job_id, progress),
+                self.session_factory(),
+            )
+        except Exception as err:
+            logger.exception(f"Job {job.job_id} failed on attempt {job.attempts}")
+            outcome = "failed"
+            retry_after = timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+            async with self.session_factory()() as session, session.begin():
+                await JobDAL(session).fail_job(job.job_id, repr(err), retry_after)
+        else:
+            outcome = "succeeded"
+            async with self.session_factory()() as session, session.begin():
+                await JobDAL(session).complete_job(job.job_id, progress)
+        finally:
+            jobs_running.inc(-1)
+        jobs_finished.inc(job_type=job.job_type, outcome=outcome)
+        job_duration_seconds.observe(
+            time.perf_counter() - started_at, job_type=job.job_type
+        )
+
+    async def run_pending(self) -> int:
+        """Runs jobs until none is runnable, returns how many ran"""
+        ran = 0
+        while (job := await self._claim()) is not None:
+            await self.run_job(job)
+            ran += 1
+        return ran
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                await self.run_pending()
+            except (OSError, SQLAlchemyError) as err:
+                logger.error(f"Claiming of jobs failed: {err}")
+            try:
+                await asyncio.wait_for(self._job_submitted.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._job_submitted.clear()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._job_submitted = asyncio.Event()
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.concurrency)
+            ]
+
+    async def stop(self) -> None:
+        """Cancels the workers, jobs they were running are taken over on lease expiry"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_worker_pool = JobWorkerPool(
+    concurrency=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_SECONDS,
+    lease=settings.JOB_LEASE_SECONDS,
+    retry_delay=settings.JOB_RETRY_DELAY_SECONDS,
+)
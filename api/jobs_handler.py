@@ -0,0 +1,55 @@
+from uuid import UUID
+
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import HTTPException
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import settings
+from api.actions.auth import get_current_user_from_token
+from api.jobs import job_worker_pool
+from api.middlewares.server_timing import ServerTimingRoute
+from api.middlewares.server_timing import timed
+from api.models import JobResponse
+from api.models import SubmitJob
+from db.jobs import JobDAL
+from db.models import User
+from db.session import get_db
+
+jobs_router = APIRouter(route_class=ServerTimingRoute)
+
+
+@jobs_router.post("/", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    body: SubmitJob,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+) -> JobResponse:
+    payload = {"user_ids": [str(user_id) for user_id in body.user_ids]}
+    if body.changes is not None:
+        payload["changes"] = body.changes.dict(exclude_none=True)
+    with timed("db"):
+        async with db.begin():
+            job = await JobDAL(db).submit_job(
+                body.job_type, payload, settings.JOB_MAX_ATTEMPTS
+            )
+    job_worker_pool.notify_submitted()
+    return JobResponse.from_orm(job)
+
+
+@jobs_router.get("/", response_model=JobResponse)
+async def get_job(
+    job_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+) -> JobResponse:
+    with timed("db"):
+        async with db.begin():
+            job = await JobDAL(db).get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with id {job_id} not found.",
+        )
+    return JobResponse.from_orm(job)
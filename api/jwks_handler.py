@@ -0,0 +1,31 @@
+import json
+from hashlib import sha256
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import Header
+from fastapi import status
+from fastapi.responses import Response
+
+import settings
+from api.cache import etag_matches
+from security import get_jwks
+
+#################################################
+# BLOCK WITH PUBLIC KEYS FOR TOKEN VERIFICATION #
+#################################################
+
+jwks_router = APIRouter()
+
+
+@jwks_router.get("/jwks.json")
+async def jwks(if_none_match: Optional[str] = Header(None)) -> Response:
+    """Public keys by kid, downstream services verify tokens locally with them"""
+    content = json.dumps(get_jwks()).encode()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+        "ETag": f'"{sha256(content).hexdigest()[:32]}"',
+    }
+    if etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
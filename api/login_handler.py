@@ -8,12 +8,19 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import settings
+from api.actions.auth import _introspect_tokens
 from api.actions.auth import authenticate_user
+from api.actions.auth import get_current_user_from_token
+from api.middlewares.server_timing import ServerTimingRoute
+from api.models import IntrospectTokens
+from api.models import IntrospectTokensResponse
 from api.models import Token
+from db.login_tracker import last_login_tracker
+from db.models import User
 from db.session import get_db
 from security import create_access_token
 
-login_router = APIRouter()
+login_router = APIRouter(route_class=ServerTimingRoute)
 
 
 @login_router.post("/token", response_model=Token)
@@ -26,9 +33,19 @@ async def login_for_access_token(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password.",
         )
+    last_login_tracker.record(user.user_id)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email, "other_custom_data": [1, 2, 3, 4]},
         expires_delta=access_token_expires,
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@login_router.post("/introspect", response_model=IntrospectTokensResponse)
+async def introspect_tokens(
+    body: IntrospectTokens,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_token),
+) -> IntrospectTokensResponse:
+    return IntrospectTokensResponse(tokens=await _introspect_tokens(body.tokens, db))
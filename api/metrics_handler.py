@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from metrics import metrics
+
+###############################
+# BLOCK WITH METRICS ENDPOINT #
+###############################
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable
+from typing import Deque
+from typing import Iterable
+from typing import Tuple
+
+from fastapi import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from metrics import metrics
+from metrics import MovingAverage
+
+########################################
+# BLOCK WITH ADMISSION CONTROL OF LOAD #
+########################################
+
+admission_rejected = metrics.counter(
+    "admission_rejected_total", "Requests shed by admission control"
+)
+admission_queue_wait_seconds = metrics.histogram(
+    "admission_queue_wait_seconds",
+    "Time requests waited for admission",
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.5, 1, 5],
+)
+admission_in_flight = metrics.gauge(
+    "admission_in_flight", "Requests admitted and not finished yet"
+)
+
+
+class AdmissionBudget:
+    """Concurrency limit with a bounded queue of waiting requests
+
+    A request that can't start at once is shed instead of queued when the
+    queue is full or when recent waits in the queue or for a pool connection
+    are above the target, because it would most likely wait too long anyway.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        target_wait: float,
+        max_wait: float,
+        pool_wait: Callable[[], float] = lambda: 0.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.target_wait = target_wait
+        self.max_wait = max_wait
+        self.pool_wait = pool_wait
+        self.queue_wait = MovingAverage()
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def overloaded(self) -> bool:
+        return (
+            self.queue_wait.value > self.target_wait
+            or self.pool_wait() > self.target_wait
+        )
+
+    def _admitted(self, waited: float) -> bool:
+        self.queue_wait.update(waited)
+        admission_queue_wait_seconds.observe(waited, budget=self.name)
+        admission_in_flight.set(self.in_flight, budget=self.name)
+        return True
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return self._admitted(0.0)
+        if len(self._waiters) >= self.max_queue or self.overloaded():
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as err:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was already handed over, so pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            waited = time.perf_counter() - started_at
+            self.queue_wait.update(waited)
+            if isinstance(err, asyncio.CancelledError):
+                raise
+            return False
+        # the slot is handed over by release, in_flight stays the same
+        return self._admitted(time.perf_counter() - started_at)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        admission_in_flight.set(self.in_flight, budget=self.name)
+
+
+class AdmissionControlMiddleware:
+    """Admits requests within the budget of their route, sheds the rest with 503
+
+    Routes listed in `expensive_routes` get their own budget, so slow logins and
+    signups can't starve cheap reads. Paths starting with one of `exempt`
+    (health checks, metrics, long-lived streams) are never limited.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default: AdmissionBudget,
+        expensive: AdmissionBudget,
+        expensive_routes: Iterable[Tuple[str, str]],
+        exempt: Iterable[str],
+        retry_after: int,
+    ):
+        self.app = app
+        self.default = default
+        self.expensive = expensive
+        self.expensive_routes = {
+            (method, path.rstrip("/")) for method, path in expensive_routes
+        }
+        self.exempt = tuple(exempt)
+        self.retry_after = retry_after
+
+    def _budget(self, scope: Scope) -> AdmissionBudget:
+        if (scope["method"], scope["path"].rstrip("/")) in self.expensive_routes:
+            return self.expensive
+        return self.default
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        budget = self._budget(scope)
+        if not await budget.acquire():
+            admission_rejected.inc(budget=budget.name)
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Server is overloaded, retry later."},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
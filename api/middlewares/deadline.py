@@ -0,0 +1,109 @@
+import asyncio
+from typing import Dict
+from typing import Iterable
+from typing import Tuple
+from typing import Union
+
+from fastapi import status
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from deadlines import deadline_after
+from deadlines import DeadlineExceeded
+from deadlines import timed_out_requests
+
+####################################
+# BLOCK WITH DEADLINES OF REQUESTS #
+####################################
+
+# SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+
+def _timeout_reason(err: Exception) -> Union[str, None]:
+    if isinstance(err, (asyncio.TimeoutError, DeadlineExceeded)):
+        return "deadline"
+    if isinstance(err, PoolTimeoutError):
+        return "pool"
+    if (
+        isinstance(err, DBAPIError)
+        and getattr(err.orig, "sqlstate", None) == QUERY_CANCELED
+    ):
+        return "statement"
+    return None
+
+
+class DeadlineMiddleware:
+    """Bounds the time of each request and answers 504 when it runs out
+
+    The timeout comes from the `header` of the request, else from the default
+    of the route in `route_timeouts`, else from `default_timeout`, and never
+    exceeds `max_timeout`. The deadline is also applied to the database, see
+    `db.session`, so that abandoned queries don't keep running.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_timeout: float,
+        max_timeout: float,
+        route_timeouts: Dict[str, float],
+        header: str,
+        exempt: Iterable[str],
+    ):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        self.route_timeouts: Dict[Tuple[str, str], float] = {}
+        for route, timeout in route_timeouts.items():
+            method, _, path = route.partition(" ")
+            self.route_timeouts[(method.upper(), path.rstrip("/"))] = timeout
+        self.header = header
+        self.exempt = tuple(exempt)
+
+    def _timeout(self, scope: Scope) -> float:
+        requested = Headers(scope=scope).get(self.header)
+        try:
+            timeout = float(requested)
+        except (TypeError, ValueError):
+            timeout = self.route_timeouts.get(
+                (scope["method"], scope["path"].rstrip("/")), self.default_timeout
+            )
+        return min(max(timeout, 0.0), self.max_timeout)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        response_started = False
+
+        async def send_with_start_mark(message: Message) -> None:
+            nonlocal response_started
+            response_started = response_started or (
+                message["type"] == "http.response.start"
+            )
+            await send(message)
+
+        timeout = self._timeout(scope)
+        try:
+            with deadline_after(timeout):
+                await asyncio.wait_for(
+                    self.app(scope, receive, send_with_start_mark), timeout
+                )
+        except Exception as err:
+            reason = _timeout_reason(err)
+            if reason is None or response_started:
+                raise
+            timed_out_requests.inc(reason=reason)
+            response = JSONResponse(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                content={"detail": "Request deadline exceeded."},
+            )
+            await response(scope, receive, send)
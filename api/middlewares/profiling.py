@@ -0,0 +1,110 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import random
+import re
+import time
+from logging import getLogger
+
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+logger = getLogger(__name__)
+
+####################################
+# BLOCK WITH PER-REQUEST PROFILING #
+####################################
+
+
+class ProfilingMiddleware:
+    """Profiles requested or sampled requests with cProfile
+
+    A request is profiled when it carries the profiling header with the
+    configured token, or when it is picked by the sample rate. Only one request
+    is profiled at a time, and everything the event loop runs meanwhile ends
+    up in its profile, so profiles are most telling on a quiet worker.
+    The pstats file and its text report are saved to a bounded directory and
+    the profile id is returned in the X-Profile-Id response header.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        directory: str,
+        max_files: int,
+        sample_rate: float = 0.0,
+        header: str = "X-Profile",
+        token: str = "",
+    ):
+        self.app = app
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.token = token.encode()
+        self._profiling = False
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self._profiling:
+            return False
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == self.header and value == self.token:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        path = re.sub(r"[^a-zA-Z0-9]+", "_", scope["path"]).strip("_")
+        profile_id = f"{time.time_ns()}-{scope['method']}-{path or 'root'}"
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"].append((b"x-profile-id", profile_id.encode()))
+            await send(message)
+
+        self._profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            self._profiling = False
+            await asyncio.to_thread(self._save, profiler, profile_id)
+
+    def _save(self, profiler: cProfile.Profile, profile_id: str) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, profile_id)
+            profiler.dump_stats(f"{path}.pstats")
+            with open(f"{path}.txt", "w") as report:
+                stats = pstats.Stats(profiler, stream=report)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(50)
+            self._remove_old_profiles()
+        except OSError as err:
+            logger.error(f"Saving of profile {profile_id} failed: {err}")
+
+    def _remove_old_profiles(self) -> None:
+        profile_ids = sorted(
+            file_name.removesuffix(".pstats")
+            for file_name in os.listdir(self.directory)
+            if file_name.endswith(".pstats")
+        )
+        for profile_id in profile_ids[: -self.max_files]:
+            for suffix in (".pstats", ".txt"):
+                self._remove(os.path.join(self.directory, profile_id + suffix))
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import Union
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+##############################################
+# BLOCK WITH SERVER-TIMING OF REQUEST PHASES #
+##############################################
+
+
+class RequestTimings:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.endpoint_finished_at: Union[float, None] = None
+
+    def add(self, phase: str, duration: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+    def header(self) -> bytes:
+        return ", ".join(
+            f"{phase};dur={duration * 1000:.3f}"
+            for phase, duration in self.phases.items()
+        ).encode()
+
+
+_request_timings: ContextVar[Union[RequestTimings, None]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Adds the duration of the block to the phase of the current request"""
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started_at)
+
+
+class ServerTimingRoute(APIRoute):
+    """Route measuring the serialization of the endpoint result as a phase"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = self._mark_finish(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _mark_finish(endpoint: Callable) -> Callable:
+        @wraps(endpoint)
+        async def endpoint_with_finish_mark(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings = _request_timings.get()
+                if timings is not None:
+                    timings.endpoint_finished_at = time.perf_counter()
+
+        return endpoint_with_finish_mark
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def timed_route_handler(request: Request) -> Response:
+            response = await route_handler(request)
+            timings = _request_timings.get()
+            if timings is not None and timings.endpoint_finished_at is not None:
+                timings.add(
+                    "serialize", time.perf_counter() - timings.endpoint_finished_at
+                )
+            return response
+
+        return timed_route_handler
+
+
+class ServerTimingMiddleware:
+    """Adds the Server-Timing header with the phases measured by `timed`"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        started_at = time.perf_counter()
+
+        async def send_with_server_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timings.add("total", time.perf_counter() - started_at)
+                message.setdefault("headers", [])
+                message["headers"].append((b"server-timing", timings.header()))
+            await send(message)
+
+        token = _request_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _request_timings.reset(token)
@@ -0,0 +1,208 @@
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+from logging import getLogger
+from queue import Full
+from queue import Queue
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Union
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+import settings
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+#####################################
+# BLOCK WITH CAPTURE OF THE TRAFFIC #
+#####################################
+
+captured_requests = metrics.counter(
+    "traffic_captured_requests_total", "Requests written to the traffic capture"
+)
+dropped_captures = metrics.counter(
+    "traffic_capture_dropped_total", "Captured requests dropped as the queue was full"
+)
+
+REDACTED = "<redacted>"
+# values of these fields never reach the capture
+SECRET_FIELDS = {"password", "hashed_password", "access_token", "token", "tokens"}
+# request headers that change how the request is served, the rest is left out
+CAPTURED_HEADERS = {
+    b"content-type",
+    b"idempotency-key",
+    b"if-none-match",
+    b"x-request-timeout",
+}
+
+
+def pseudonymize_email(email: str) -> str:
+    """Replaces the email with a stable one, so duplicates stay duplicates"""
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), email.lower().encode(), hashlib.sha256
+    ).hexdigest()
+    return f"user-{digest[:16]}@replay.example.com"
+
+
+def sanitize(value: Any, field: str = "") -> Any:
+    if field in SECRET_FIELDS:
+        return REDACTED
+    if isinstance(value, dict):
+        return {name: sanitize(item, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return [sanitize(item, field) for item in value]
+    if isinstance(value, str) and field in ("email", "username"):
+        return pseudonymize_email(value)
+    return value
+
+
+def _parse_body(content_type: str, body: bytes) -> Union[Any, None]:
+    try:
+        if content_type.startswith("application/json"):
+            return json.loads(body)
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            return dict(parse_qsl(body.decode()))
+    except ValueError:
+        pass
+    return None
+
+
+class TrafficRecorder:
+    """Appends captured requests as NDJSON from a writer thread
+
+    Each entry is written with a single append, so the workers of a server can
+    share the file. Entries are dropped instead of blocking when the bounded
+    queue is full.
+    """
+
+    def __init__(self, path: str, queue_size: int):
+        self.path = path
+        self._queue: Queue[Union[Dict, None]] = Queue(maxsize=queue_size)
+        self._thread: Union[threading.Thread, None] = None
+
+    def record(self, entry: Dict) -> None:
+        try:
+            self._queue.put_nowait(entry)
+        except Full:
+            dropped_captures.inc()
+
+    def _write(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    return
+                os.write(fd, (json.dumps(entry) + "\n").encode())
+                captured_requests.inc()
+        finally:
+            os.close(fd)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._write, name="traffic-capture", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Writes out the queued entries and stops the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class TrafficCaptureMiddleware:
+    """Records sampled requests with their outcome and timing for a later replay
+
+    Secrets are redacted and emails are replaced by stable pseudonyms, only
+    whether a request was authorized is kept of its credentials. Bodies larger
+    than `max_body_bytes` are left out.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        recorder: TrafficRecorder,
+        sample_rate: float,
+        max_body_bytes: int,
+        exempt: Iterable[str],
+    ):
+        self.app = app
+        self.recorder = recorder
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self.exempt = tuple(exempt)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"].startswith(self.exempt)
+            or random.random() >= self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        body = bytearray()
+        response: Dict[str, int] = {"status": 0, "bytes": 0}
+
+        async def receive_with_capture() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and len(body) <= self.max_body_bytes:
+                body.extend(message.get("body", b""))
+            return message
+
+        async def send_with_capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_with_capture, send_with_capture)
+        finally:
+            duration = time.perf_counter() - started
+            content_type = headers.get(b"content-type", b"").decode()
+            query = dict(parse_qsl(scope["query_string"].decode()))
+            self.recorder.record(
+                {
+                    "ts": started_at,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "query": sanitize(query),
+                    "headers": {
+                        name.decode(): value.decode()
+                        for name, value in headers.items()
+                        if name in CAPTURED_HEADERS
+                    },
+                    "authorized": b"authorization" in headers,
+                    "body": sanitize(_parse_body(content_type, bytes(body)))
+                    if len(body) <= self.max_body_bytes
+                    else None,
+                    "status": response["status"],
+                    "response_bytes": response["bytes"],
+                    "duration_ms": round(duration * 1000, 3),
+                }
+            )
+
+
+traffic_recorder = TrafficRecorder(
+    path=settings.TRAFFIC_CAPTURE_PATH, queue_size=settings.TRAFFIC_CAPTURE_QUEUE_SIZE
+)
@@ -1,14 +1,21 @@
 import re
+from datetime import datetime
 from http import HTTPStatus
+from typing import Dict
+from typing import List
+from typing import Literal
 from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException
 from pydantic import BaseModel
+from pydantic import conlist
 from pydantic import constr
 from pydantic import EmailStr
 from pydantic import validator
 
+import settings
+
 #########################
 # BLOCK WITH API MODELS #
 #########################
@@ -48,6 +55,18 @@ class GetUserResponse(TunedModel):
     is_active: bool
 
 
+class EmailAvailabilityResponse(BaseModel):
+    email: EmailStr
+    available: bool
+
+
+class UserStatsResponse(BaseModel):
+    total: int
+    active: Optional[int]
+    inactive: Optional[int]
+    estimated: bool
+
+
 class BaseUser(BaseModel):
     name: Optional[constr(min_length=1)]
     surname: Optional[constr(min_length=1)]
@@ -89,3 +108,136 @@ class UpdateUser(BaseUser):
 class Token(BaseModel):
     access_token: str
     token_type: str
+
+
+class IntrospectTokens(BaseModel):
+    tokens: conlist(str, min_items=1, max_items=settings.INTROSPECTION_MAX_TOKENS)
+
+
+class TokenIntrospection(BaseModel):
+    active: bool
+    sub: Optional[str]
+    exp: Optional[int]
+
+
+class IntrospectTokensResponse(BaseModel):
+    tokens: List[TokenIntrospection]
+
+
+class UpdateUsersChanges(UpdateUser):
+    @validator("email")
+    def validate_email(cls, value):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail="Email can't be set for many users at once.",
+        )
+
+
+class SubmitJob(BaseModel):
+    job_type: Literal["deactivate_users", "update_users"]
+    user_ids: conlist(UUID, min_items=1, max_items=settings.JOB_MAX_USER_IDS)
+    changes: Optional[UpdateUsersChanges]
+
+    @validator("changes", always=True)
+    def validate_changes(cls, value, values):
+        if values.get("job_type") == "update_users" and (
+            value is None or not value.dict(exclude_none=True)
+        ):
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail="At least one change should be provided for update_users.",
+            )
+        return value
+
+
+class JobResponse(TunedModel):
+    job_id: UUID
+    job_type: str
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: dict
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+
+class BatchOperation(BaseModel):
+    method: Literal["create", "get", "update", "delete"]
+    user_id: Optional[UUID]
+    # validated when the operation runs, so a bad body fails only its operation
+    body: Optional[dict]
+
+    @validator("user_id", always=True)
+    def validate_user_id(cls, value, values):
+        if values.get("method", "create") != "create" and value is None:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail=f"user_id should be provided for {values.get('method')}.",
+            )
+        return value
+
+    @validator("body", always=True)
+    def validate_body(cls, value, values):
+        if values.get("method") in ("create", "update") and value is None:
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail=f"body should be provided for {values.get('method')}.",
+            )
+        return value
+
+
+class BatchRequest(BaseModel):
+    operations: conlist(
+        BatchOperation, min_items=1, max_items=settings.BATCH_MAX_OPERATIONS
+    )
+    # all operations are rolled back when one of them fails
+    atomic: bool = False
+
+
+class BatchOperationResult(BaseModel):
+    status: int
+    body: Optional[dict]
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchOperationResult]
+
+
+class AllocationSite(BaseModel):
+    file: str
+    line: int
+    size: int
+    count: int
+    size_diff: Optional[int]
+    count_diff: Optional[int]
+    traceback: Optional[List[str]]
+
+
+class MemoryTracingResponse(BaseModel):
+    tracing: bool
+    frames: int
+    snapshot_ids: List[int]
+
+
+class MemorySnapshotResponse(BaseModel):
+    snapshot_id: int
+    traced_size: int
+    traced_current: int
+    traced_peak: int
+    top: List[AllocationSite]
+
+
+class MemoryDiffResponse(BaseModel):
+    base_id: int
+    snapshot_id: int
+    top: List[AllocationSite]
+
+
+class GcStatsResponse(BaseModel):
+    counts: List[int]
+    thresholds: List[int]
+    generations: List[dict]
+    uncollectable: int
+    max_rss: int
+    objects_by_type: Dict[str, int]
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import timedelta
+from logging import getLogger
+from typing import Callable
+from typing import Union
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from db.session import get_sessionmaker
+from db.session import get_user_dal
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+########################################
+# BLOCK FOR ARCHIVAL OF INACTIVE USERS #
+########################################
+
+archived_users = metrics.counter(
+    "users_archived_total", "Deactivated users moved to the archive"
+)
+
+
+class UserArchiver:
+    """Periodically moves users deactivated longer than the retention to the archive
+
+    Every batch is a short transaction of its own and skips rows locked by
+    requests, so the archival never holds locks for long or waits on them.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        retention: timedelta,
+        batch_size: int,
+        batch_pause: float,
+        session_factory: Callable[[], sessionmaker] = get_sessionmaker,
+    ):
+        self.interval = interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.session_factory = session_factory
+        self._task: Union[asyncio.Task, None] = None
+
+    async def archive(self) -> int:
+        """Archives batches until no user is due, returns how many were moved"""
+        moved = 0
+        while True:
+            try:
+                async with self.session_factory()() as session, session.begin():
+                    batch = await get_user_dal(session).archive_inactive_users(
+                        self.retention, self.batch_size
+                    )
+            except (OSError, SQLAlchemyError) as err:
+                logger.error(f"Archival of inactive users failed: {err}")
+                return moved
+            moved += batch
+            archived_users.inc(batch)
+            if batch < self.batch_size:
+                return moved
+            # leaves room for vacuum and replication between the batches
+            await asyncio.sleep(self.batch_pause)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.archive()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+user_archiver = UserArchiver(
+    interval=settings.USER_ARCHIVE_INTERVAL_SECONDS,
+    retention=timedelta(days=settings.USER_ARCHIVE_RETENTION_DAYS),
+    batch_size=settings.USER_ARCHIVE_BATCH_SIZE,
+    batch_pause=settings.USER_ARCHIVE_BATCH_PAUSE_SECONDS,
+)
@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import time
+from logging import getLogger
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from db.models import User
+from db.session import get_sessionmaker
+from db.session import get_user_dal
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+###########################################
+# BLOCK FOR GROUP COMMIT OF CREATED USERS #
+###########################################
+
+coalesced_batch_size = metrics.histogram(
+    "user_create_batch_size",
+    "Users created by one coalesced transaction",
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250],
+)
+coalesce_wait_seconds = metrics.histogram(
+    "user_create_coalesce_wait_seconds",
+    "Time a create waited for its coalesced transaction to commit",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1],
+)
+
+PendingCreate = Tuple[Dict[str, str], asyncio.Future]
+
+
+class UserCreateCoalescer:
+    """Creates users of concurrent requests together in one transaction
+
+    The first create starts a window of `window` seconds, and creates arriving
+    in it share a multi-row insert and a commit. A batch is flushed before the
+    window ends when it reaches `max_batch`. A wider window trades latency of
+    single creates for fewer transactions under load.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_batch: int,
+        session_factory: Callable[[], sessionmaker] = get_sessionmaker,
+    ):
+        self.window = window
+        self.max_batch = max_batch
+        self.session_factory = session_factory
+        self._pending: List[PendingCreate] = []
+        self._flush_handle: Union[asyncio.TimerHandle, None] = None
+        self._flushes = set()
+
+    async def create_user(
+        self, name: str, surname: str, email: str, hashed_password: str
+    ) -> Union[User, None]:
+        """Returns None when the email is already taken, like UserDAL.create_user"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(
+            (
+                {
+                    "name": name,
+                    "surname": surname,
+                    "email": email,
+                    "hashed_password": hashed_password,
+                },
+                future,
+            )
+        )
+        # flushes run without the context of the request that started the window,
+        # as its deadline must not cut the transaction of the others short
+        if len(self._pending) >= self.max_batch:
+            self._cancel_window()
+            loop.call_soon(self._flush_pending, context=contextvars.Context())
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self.window, self._flush_pending, context=contextvars.Context()
+            )
+        started_at = time.perf_counter()
+        try:
+            # a request cancelled meanwhile still has its user created
+            return await asyncio.shield(future)
+        finally:
+            coalesce_wait_seconds.observe(time.perf_counter() - started_at)
+
+    def _cancel_window(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def _flush_pending(self) -> None:
+        self._cancel_window()
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        flush = asyncio.create_task(self.flush(batch))
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _create_users(
+        self, users: List[Dict[str, str]]
+    ) -> List[Union[User, None]]:
+        async with self.session_factory()() as session, session.begin():
+            return await get_user_dal(session).create_users(users)
+
+    async def flush(self, batch: List[PendingCreate]) -> None:
+        coalesced_batch_size.observe(len(batch))
+        try:
+            results = await self._create_users([user for user, _ in batch])
+        except IntegrityError as err:
+            if len(batch) == 1:
+                _, future = batch[0]
+                future.set_exception(err)
+                return
+            # a row the claim of emails let through failed the whole batch,
+            # so each row is retried alone to fail only itself
+            logger.warning(f"Coalesced create of {len(batch)} users failed: {err}")
+            await asyncio.gather(*(self.flush([pending]) for pending in batch))
+            return
+        except Exception as err:
+            for _, future in batch:
+                future.set_exception(err)
+            return
+        for (_, future), user in zip(batch, results):
+            future.set_result(user)
+
+
+user_create_coalescer = UserCreateCoalescer(
+    window=settings.USER_CREATE_COALESCE_WINDOW_SECONDS,
+    max_batch=settings.USER_CREATE_COALESCE_MAX_BATCH,
+)
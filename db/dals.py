@@ -1,62 +1,273 @@
 ###########################################################
 # BLOCK FOR INTERACTION WITH DATABASE IN BUSINESS CONTEXT #
 ###########################################################
+import json
+import random
+from datetime import datetime
+from datetime import timedelta
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Tuple
 from typing import Union
 from uuid import UUID
+from uuid import uuid4
 
 from sqlalchemy import and_
+from sqlalchemy import Boolean
+from sqlalchemy import cast
+from sqlalchemy import column
+from sqlalchemy import DateTime
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import Integer
+from sqlalchemy import literal_column
+from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import String
+from sqlalchemy import text
 from sqlalchemy import update
+from sqlalchemy import values
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from db.models import ArchivedUser
 from db.models import User
+from db.models import USER_STATS_COUNTER_SLOTS
+from db.models import UserEmail
+from db.models import UserStatsCounter
+from db.repository import UserRepository
 
+# channel of the postgres NOTIFY events about changed users
+USER_CHANGES_CHANNEL = "user_changes"
 
-class UserDAL:
+
+class UserDAL(UserRepository):
     """Data Access Layer for operating user info"""
 
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
+    async def _notify_change(
+        self, operation: str, user_id: UUID, email: Union[str, None] = None
+    ) -> None:
+        """Publishes the change, postgres delivers it only on commit"""
+        change = {"operation": operation, "user_id": str(user_id)}
+        if email is not None:
+            # lets other workers learn about taken emails without a query
+            change["email"] = email
+        payload = json.dumps(change)
+        await self.db_session.execute(
+            select(func.pg_notify(USER_CHANGES_CHANNEL, payload))
+        )
+
+    async def _notify_creates(self, users: List[User]) -> None:
+        """Publishes the creation of many users with a single statement"""
+        await self.db_session.execute(
+            text(
+                "SELECT count(pg_notify(:channel, json_build_object("
+                "'operation', 'create', 'user_id', user_id, 'email', email)::text)) "
+                "FROM unnest(CAST(:user_ids AS uuid[]), CAST(:emails AS text[])) "
+                "AS created(user_id, email)"
+            ),
+            {
+                "channel": USER_CHANGES_CHANNEL,
+                "user_ids": [user.user_id for user in users],
+                "emails": [user.email for user in users],
+            },
+        )
+
+    async def _notify_changes(self, operation: str, user_ids: List[UUID]) -> None:
+        """Publishes the same change of many users with a single statement"""
+        await self.db_session.execute(
+            text(
+                "SELECT count(pg_notify(:channel, json_build_object("
+                "'operation', CAST(:operation AS text), 'user_id', user_id)::text)) "
+                "FROM unnest(CAST(:user_ids AS uuid[])) AS user_id"
+            ),
+            {
+                "channel": USER_CHANGES_CHANNEL,
+                "operation": operation,
+                "user_ids": user_ids,
+            },
+        )
+
+    async def _count_users(self, total: int, active: int) -> None:
+        """Adds to the user counters in a random slot, to spread row locks"""
+        query = insert(UserStatsCounter).values(
+            slot=random.randrange(USER_STATS_COUNTER_SLOTS), total=total, active=active
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[UserStatsCounter.slot],
+            set_={
+                "total": UserStatsCounter.total + query.excluded.total,
+                "active": UserStatsCounter.active + query.excluded.active,
+            },
+        )
+        await self.db_session.execute(query)
+
     async def create_user(
         self, name: str, surname: str, email: str, hashed_password: str
-    ) -> User:
-        new_user = User(
-            name=name,
-            surname=surname,
-            email=email,
-            hashed_password=hashed_password,
-        )
-        self.db_session.add(new_user)
-        await self.db_session.flush()
+    ) -> Union[User, None]:
+        user_id = uuid4()
+        # the email is claimed first, the row in users then only has to be inserted
+        claim_email_query = (
+            insert(UserEmail)
+            .values(email=email, user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[UserEmail.email])
+            .returning(UserEmail.user_id)
+        )
+        res = await self.db_session.execute(claim_email_query)
+        if res.fetchone() is None:
+            return None
+        query = (
+            insert(User)
+            .values(
+                user_id=user_id,
+                name=name,
+                surname=surname,
+                email=email,
+                hashed_password=hashed_password,
+            )
+            .returning(User)
+        )
+        res = await self.db_session.execute(query)
+        new_user = res.fetchone()[0]
+        await self._count_users(total=1, active=1)
+        await self._notify_change("create", new_user.user_id, email)
         return new_user
 
+    async def create_users(
+        self, users: List[Dict[str, str]]
+    ) -> List[Union[User, None]]:
+        """Creates many users with one statement per table
+
+        Results are in the order of the given users, None where the email is
+        taken, also when an earlier user of the same call took it.
+        """
+        new_users = [{**user, "user_id": uuid4()} for user in users]
+        claim_emails_query = (
+            insert(UserEmail)
+            .values(
+                [
+                    {"email": user["email"], "user_id": user["user_id"]}
+                    for user in new_users
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=[UserEmail.email])
+            .returning(UserEmail.user_id)
+        )
+        res = await self.db_session.execute(claim_emails_query)
+        claimed_user_ids = set(res.scalars().all())
+        claimed_users = [
+            user for user in new_users if user["user_id"] in claimed_user_ids
+        ]
+        created_users: Dict[UUID, User] = {}
+        if claimed_users:
+            res = await self.db_session.execute(
+                insert(User).values(claimed_users).returning(User)
+            )
+            created_users = {user.user_id: user for user in res.scalars().all()}
+            await self._count_users(total=len(created_users), active=len(created_users))
+            await self._notify_creates(list(created_users.values()))
+        return [created_users.get(user["user_id"]) for user in new_users]
+
     async def delete_user(self, user_id: UUID) -> Union[UUID, None]:
         query = (
             update(User)
             .where(and_(User.user_id == user_id, User.is_active == True))
-            .values(is_active=False)
+            .values(is_active=False, deactivated_at=func.now())
             .returning(User.user_id)
         )
         res = await self.db_session.execute(query)
         deleted_user_id_row = res.fetchone()
         if deleted_user_id_row is not None:
+            await self._count_users(total=0, active=-1)
+            await self._notify_change("delete", deleted_user_id_row[0])
             return deleted_user_id_row[0]
 
+    async def delete_users(self, user_ids: List[UUID]) -> List[UUID]:
+        query = (
+            update(User)
+            .where(and_(User.user_id.in_(user_ids), User.is_active == True))
+            .values(is_active=False, deactivated_at=func.now())
+            .returning(User.user_id)
+        )
+        res = await self.db_session.execute(query)
+        deleted_user_ids = res.scalars().all()
+        if deleted_user_ids:
+            await self._count_users(total=0, active=-len(deleted_user_ids))
+            await self._notify_changes("delete", deleted_user_ids)
+        return deleted_user_ids
+
+    async def _get_archived_user_with_version_by_id(
+        self, user_id: UUID
+    ) -> Union[Tuple[User, int], None]:
+        query = select(ArchivedUser, literal_column("xmin", Integer)).where(
+            ArchivedUser.user_id == user_id
+        )
+        res = await self.db_session.execute(query)
+        archived_user_row = res.fetchone()
+        if archived_user_row is not None:
+            archived_user = archived_user_row[0]
+            # detached copy, so callers get a User wherever the row lives
+            user = User(
+                **{
+                    column.key: getattr(archived_user, column.key)
+                    for column in User.__table__.columns
+                }
+            )
+            return user, archived_user_row[1]
+
     async def get_user_by_id(self, user_id: UUID) -> Union[User, None]:
         query = select(User).where(User.user_id == user_id)
         res = await self.db_session.execute(query)
         user = res.fetchone()
         if user is not None:
             return user[0]
+        archived_user = await self._get_archived_user_with_version_by_id(user_id)
+        if archived_user is not None:
+            return archived_user[0]
+
+    async def get_user_with_version_by_id(
+        self, user_id: UUID
+    ) -> Union[Tuple[User, int], None]:
+        """Returns the user together with its row version (xmin)"""
+        query = select(User, literal_column("xmin", Integer)).where(
+            User.user_id == user_id
+        )
+        res = await self.db_session.execute(query)
+        user_row = res.fetchone()
+        if user_row is not None:
+            return user_row[0], user_row[1]
+        return await self._get_archived_user_with_version_by_id(user_id)
 
     async def get_user_by_email(self, email: str) -> Union[User, None]:
-        query = select(User).where(User.email == email)
+        # user_id is resolved by an initplan, so partitions are pruned at run time
+        query = select(User).where(
+            User.user_id
+            == select(UserEmail.user_id)
+            .where(UserEmail.email == email)
+            .scalar_subquery()
+        )
         res = await self.db_session.execute(query)
         user = res.fetchone()
         if user is not None:
             return user[0]
 
+    async def get_users_by_emails(self, emails: List[str]) -> List[User]:
+        # ids are resolved first, so the lookup in users prunes partitions
+        query = select(UserEmail.user_id).where(UserEmail.email.in_(emails))
+        res = await self.db_session.execute(query)
+        user_ids = res.scalars().all()
+        if not user_ids:
+            return []
+        query = select(User).where(User.user_id.in_(user_ids))
+        res = await self.db_session.execute(query)
+        return res.scalars().all()
+
     async def update_user(self, user_id: UUID, **kwargs) -> Union[UUID, None]:
         query = (
             update(User)
@@ -67,4 +278,145 @@ class UserDAL:
         res = await self.db_session.execute(query)
         updated_user_id_row = res.fetchone()
         if updated_user_id_row is not None:
+            await self._notify_change(
+                "update", updated_user_id_row[0], kwargs.get("email")
+            )
             return updated_user_id_row[0]
+
+    async def update_users(self, user_ids: List[UUID], **kwargs) -> List[UUID]:
+        query = (
+            update(User)
+            .where(and_(User.user_id.in_(user_ids), User.is_active == True))
+            .values(kwargs)
+            .returning(User.user_id)
+        )
+        res = await self.db_session.execute(query)
+        updated_user_ids = res.scalars().all()
+        if updated_user_ids:
+            await self._notify_changes("update", updated_user_ids)
+        return updated_user_ids
+
+    async def update_last_login_at(self, logins: Dict[UUID, datetime]) -> None:
+        """Stores login times of many users with a single UPDATE ... FROM VALUES"""
+        logins_values = values(
+            column("user_id", PG_UUID(as_uuid=True)),
+            column("login_at", DateTime(timezone=True)),
+            name="logins",
+        ).data(list(logins.items()))
+        query = (
+            update(User)
+            .where(User.user_id == logins_values.c.user_id)
+            .where(
+                or_(
+                    User.last_login_at.is_(None),
+                    User.last_login_at < logins_values.c.login_at,
+                )
+            )
+            .values(last_login_at=logins_values.c.login_at)
+        )
+        await self.db_session.execute(query)
+
+    async def iter_emails(self, batch_size: int) -> AsyncIterator[str]:
+        """Streams all taken emails with a server side cursor"""
+        res = await self.db_session.stream_scalars(
+            select(UserEmail.email).execution_options(yield_per=batch_size)
+        )
+        async for email in res:
+            yield email
+
+    async def get_user_stats(self) -> Tuple[int, int]:
+        """Returns total and active users from the counters"""
+        query = select(
+            func.coalesce(func.sum(UserStatsCounter.total), 0),
+            func.coalesce(func.sum(UserStatsCounter.active), 0),
+        )
+        res = await self.db_session.execute(query)
+        total, active = res.fetchone()
+        return int(total), int(active)
+
+    async def estimate_user_stats(self) -> Tuple[int, Union[int, None]]:
+        """Estimates total and active users from the planner statistics"""
+        res = await self.db_session.execute(
+            text(
+                "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'users'::regclass"
+            )
+        )
+        users_total = int(res.scalar_one())
+        res = await self.db_session.execute(
+            text(
+                "SELECT greatest(reltuples, 0) FROM pg_class "
+                "WHERE oid = 'users_archive'::regclass"
+            )
+        )
+        # archived users are all inactive
+        total = users_total + int(res.scalar_one())
+        res = await self.db_session.execute(
+            select(
+                cast(cast(column("most_common_vals"), String), ARRAY(Boolean)),
+                column("most_common_freqs"),
+            )
+            .select_from(text("pg_stats"))
+            .where(text("tablename = 'users' AND attname = 'is_active' AND inherited"))
+        )
+        is_active_stats = res.fetchone()
+        if is_active_stats is None or is_active_stats[0] is None:
+            return total, None
+        frequencies = dict(zip(*is_active_stats))
+        return total, round(users_total * frequencies.get(True, 0))
+
+    async def reconcile_user_stats(self) -> Tuple[int, int]:
+        """Replaces the counters with exact counts of users"""
+        # blocks writers of counters, so no increment is counted twice or lost
+        await self.db_session.execute(
+            text("LOCK TABLE user_stats_counters IN EXCLUSIVE MODE")
+        )
+        res = await self.db_session.execute(
+            select(func.count(), func.count().filter(User.is_active == True))
+        )
+        total, active = res.fetchone()
+        res = await self.db_session.execute(
+            select(func.count()).select_from(ArchivedUser)
+        )
+        total += res.scalar_one()
+        await self.db_session.execute(delete(UserStatsCounter))
+        await self.db_session.execute(
+            insert(UserStatsCounter).values(slot=0, total=total, active=active)
+        )
+        return total, active
+
+    async def archive_inactive_users(
+        self, deactivated_before: timedelta, batch_size: int
+    ) -> int:
+        """Moves a batch of users deactivated long ago to the archive
+
+        Rows locked by others are skipped, so a batch never waits on them.
+        """
+        due_user_ids = (
+            select(User.user_id)
+            .where(
+                and_(
+                    User.is_active == False,
+                    User.deactivated_at < func.now() - deactivated_before,
+                )
+            )
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        moved_users = (
+            delete(User)
+            .where(User.user_id.in_(due_user_ids.scalar_subquery()))
+            .returning(*User.__table__.columns)
+            .cte("moved_users")
+        )
+        columns = [column.key for column in User.__table__.columns]
+        query = (
+            insert(ArchivedUser)
+            .from_select(
+                columns, select(*(moved_users.c[column] for column in columns))
+            )
+            .returning(ArchivedUser.user_id)
+        )
+        res = await self.db_session.execute(query)
+        return len(res.fetchall())
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from typing import Union
+from uuid import UUID
+
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Job
+
+###################################
+# BLOCK FOR THE QUEUE OF THE JOBS #
+###################################
+
+
+class JobDAL:
+    """Data Access Layer for operating the jobs table as a queue"""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def submit_job(self, job_type: str, payload: dict, max_attempts: int) -> Job:
+        query = (
+            insert(Job)
+            .values(
+                job_type=job_type,
+                payload=payload,
+                status="queued",
+                attempts=0,
+                max_attempts=max_attempts,
+                progress={},
+            )
+            .returning(Job)
+        )
+        res = await self.db_session.execute(query)
+        return res.scalar_one()
+
+    async def get_job(self, job_id: UUID) -> Union[Job, None]:
+        res = await self.db_session.execute(select(Job).where(Job.job_id == job_id))
+        return res.scalar_one_or_none()
+
+    async def claim_job(self, lease: timedelta) -> Union[Job, None]:
+        """Takes the oldest runnable job, concurrent claims skip each other's rows
+
+        A running job whose lease expired belongs to a worker that died, so it
+        is taken over as well.
+        """
+        runnable_job_id = (
+            select(Job.job_id)
+            .where(
+                and_(Job.status.in_(("queued", "running")), Job.run_after <= func.now())
+            )
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        query = (
+            update(Job)
+            .where(Job.job_id == runnable_job_id)
+            .values(
+                status="running",
+                attempts=Job.attempts + 1,
+                run_after=func.now() + lease,
+            )
+            .returning(Job)
+        )
+        res = await self.db_session.execute(query)
+        return res.scalar_one_or_none()
+
+    async def save_progress(
+        self, job_id: UUID, progress: dict, lease: timedelta
+    ) -> None:
+        """Stores the progress and extends the lease of the running job"""
+        query = (
+            update(Job)
+            .where(Job.job_id == job_id)
+            .values(progress=progress, run_after=func.now() + lease)
+        )
+        await self.db_session.execute(query)
+
+    async def complete_job(self, job_id: UUID, progress: dict) -> None:
+        query = (
+            update(Job)
+            .where(Job.job_id == job_id)
+            .values(status="succeeded", progress=progress, finished_at=func.now())
+        )
+        await self.db_session.execute(query)
+
+    async def fail_job(self, job_id: UUID, error: str, retry_after: timedelta) -> None:
+        """Queues the job again, or fails it for good when it has no attempts left"""
+        retry = Job.attempts < Job.max_attempts
+        query = (
+            update(Job)
+            .where(Job.job_id == job_id)
+            .values(
+                status=case((retry, "queued"), else_="failed"),
+                error=error,
+                run_after=func.now() + retry_after,
+                finished_at=case((retry, None), else_=func.now()),
+            )
+        )
+        await self.db_session.execute(query)
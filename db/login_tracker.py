@@ -0,0 +1,124 @@
+import asyncio
+import time
+from datetime import datetime
+from datetime import timezone
+from logging import getLogger
+from typing import Callable
+from typing import Dict
+from typing import Union
+from uuid import UUID
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from db.session import get_sessionmaker
+from db.session import get_user_dal
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+##############################################
+# BLOCK FOR WRITE-BEHIND OF LAST LOGIN TIMES #
+##############################################
+
+flush_batch_size = metrics.histogram(
+    "last_login_flush_batch_size",
+    "Users updated by one flush of login times",
+    buckets=[1, 10, 100, 1000, 10000],
+)
+flush_lag_seconds = metrics.histogram(
+    "last_login_flush_lag_seconds",
+    "Age of the oldest login time when it was saved",
+    buckets=[0.1, 0.5, 1, 5, 10, 30, 60],
+)
+pending_logins = metrics.gauge("last_login_pending", "Users with an unsaved login time")
+dropped_logins = metrics.counter(
+    "last_login_dropped_total", "Login times dropped because the buffer was full"
+)
+
+
+class LastLoginTracker:
+    """Buffers login times in memory and saves them periodically in bulk
+
+    Only the latest login per user is kept, so the buffer is bounded by the
+    number of distinct users that logged in since the last flush.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        flush_interval: float,
+        session_factory: Callable[[], sessionmaker] = get_sessionmaker,
+    ):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self._pending: Dict[UUID, datetime] = {}
+        self._oldest_pending_at: Union[float, None] = None
+        self._flush_requested: Union[asyncio.Event, None] = None
+        self._task: Union[asyncio.Task, None] = None
+        self._stopping = False
+
+    def record(self, user_id: UUID, login_at: Union[datetime, None] = None) -> None:
+        if user_id not in self._pending and len(self._pending) >= self.max_size:
+            dropped_logins.inc()
+            return
+        if self._oldest_pending_at is None:
+            self._oldest_pending_at = time.monotonic()
+        self._pending[user_id] = login_at or datetime.now(timezone.utc)
+        pending_logins.set(len(self._pending))
+        if len(self._pending) >= self.max_size and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        logins, self._pending = self._pending, {}
+        oldest_pending_at, self._oldest_pending_at = self._oldest_pending_at, None
+        try:
+            async with self.session_factory()() as session, session.begin():
+                await get_user_dal(session).update_last_login_at(logins)
+        except (OSError, SQLAlchemyError) as err:
+            logger.error(f"Saving of last login times failed: {err}")
+            # newer logins recorded meanwhile win over the failed ones
+            self._pending = {**logins, **self._pending}
+            self._oldest_pending_at = oldest_pending_at
+            return 0
+        finally:
+            pending_logins.set(len(self._pending))
+        flush_batch_size.observe(len(logins))
+        flush_lag_seconds.observe(time.monotonic() - oldest_pending_at)
+        return len(logins)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the periodic flushing and saves what is still buffered"""
+        if self._task is not None:
+            self._stopping = True
+            self._flush_requested.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+last_login_tracker = LastLoginTracker(
+    max_size=settings.LAST_LOGIN_BUFFER_SIZE,
+    flush_interval=settings.LAST_LOGIN_FLUSH_SECONDS,
+)
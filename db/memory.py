@@ -0,0 +1,204 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from typing import AsyncIterator
+from typing import Dict
+from typing import Generator
+from typing import List
+from typing import Tuple
+from typing import Union
+from uuid import UUID
+from uuid import uuid4
+
+from sqlalchemy.exc import IntegrityError
+
+from db.models import User
+from db.repository import UserRepository
+
+#####################################
+# BLOCK WITH IN-MEMORY USER STORAGE #
+#####################################
+
+
+class InMemoryUserStore:
+    """Users indexed by id and by email, with a version per user like xmin"""
+
+    def __init__(self):
+        self.users: Dict[UUID, User] = {}
+        self.user_ids_by_email: Dict[str, UUID] = {}
+        self.versions: Dict[UUID, int] = {}
+        self.archived_users: Dict[UUID, User] = {}
+
+    def clear(self) -> None:
+        self.users.clear()
+        self.archived_users.clear()
+        self.user_ids_by_email.clear()
+        self.versions.clear()
+
+
+class InMemorySession:
+    """Stands in for AsyncSession, changes are applied at once and never rolled back"""
+
+    def __init__(self, store: InMemoryUserStore):
+        self.store = store
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator["InMemorySession"]:
+        yield self
+
+    @asynccontextmanager
+    async def begin_nested(self) -> AsyncIterator["InMemorySession"]:
+        yield self
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "InMemorySession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+class InMemoryUserDAL(UserRepository):
+    def __init__(self, store: InMemoryUserStore):
+        self.store = store
+
+    def _bump_version(self, user_id: UUID) -> None:
+        self.store.versions[user_id] = self.store.versions.get(user_id, 0) + 1
+
+    async def create_user(
+        self, name: str, surname: str, email: str, hashed_password: str
+    ) -> Union[User, None]:
+        if email in self.store.user_ids_by_email:
+            return None
+        new_user = User(
+            user_id=uuid4(),
+            name=name,
+            surname=surname,
+            email=email,
+            is_active=True,
+            hashed_password=hashed_password,
+        )
+        self.store.users[new_user.user_id] = new_user
+        self.store.user_ids_by_email[email] = new_user.user_id
+        self._bump_version(new_user.user_id)
+        return new_user
+
+    async def create_users(
+        self, users: List[Dict[str, str]]
+    ) -> List[Union[User, None]]:
+        return [await self.create_user(**user) for user in users]
+
+    async def delete_user(self, user_id: UUID) -> Union[UUID, None]:
+        user = self.store.users.get(user_id)
+        if user is not None and user.is_active:
+            user.is_active = False
+            user.deactivated_at = datetime.now(timezone.utc)
+            self._bump_version(user_id)
+            return user_id
+
+    async def delete_users(self, user_ids: List[UUID]) -> List[UUID]:
+        deleted_user_ids = []
+        for user_id in user_ids:
+            if await self.delete_user(user_id) is not None:
+                deleted_user_ids.append(user_id)
+        return deleted_user_ids
+
+    async def get_user_by_id(self, user_id: UUID) -> Union[User, None]:
+        return self.store.users.get(user_id) or self.store.archived_users.get(user_id)
+
+    async def get_user_with_version_by_id(
+        self, user_id: UUID
+    ) -> Union[Tuple[User, int], None]:
+        user = await self.get_user_by_id(user_id)
+        if user is not None:
+            return user, self.store.versions[user_id]
+
+    async def get_user_by_email(self, email: str) -> Union[User, None]:
+        user_id = self.store.user_ids_by_email.get(email)
+        if user_id is not None:
+            return self.store.users.get(user_id)
+
+    async def get_users_by_emails(self, emails: List[str]) -> List[User]:
+        users = [
+            self.store.users.get(self.store.user_ids_by_email[email])
+            for email in emails
+            if email in self.store.user_ids_by_email
+        ]
+        return [user for user in users if user is not None]
+
+    async def update_user(self, user_id: UUID, **kwargs) -> Union[UUID, None]:
+        user = self.store.users.get(user_id)
+        if user is None or not user.is_active:
+            return None
+        email = kwargs.get("email", user.email)
+        if self.store.user_ids_by_email.get(email, user_id) != user_id:
+            raise IntegrityError(
+                "UPDATE users", kwargs, ValueError(f"Email {email} is already taken")
+            )
+        del self.store.user_ids_by_email[user.email]
+        self.store.user_ids_by_email[email] = user_id
+        for field, value in kwargs.items():
+            setattr(user, field, value)
+        self._bump_version(user_id)
+        return user_id
+
+    async def update_users(self, user_ids: List[UUID], **kwargs) -> List[UUID]:
+        updated_user_ids = []
+        for user_id in user_ids:
+            if await self.update_user(user_id, **kwargs) is not None:
+                updated_user_ids.append(user_id)
+        return updated_user_ids
+
+    async def update_last_login_at(self, logins: Dict[UUID, datetime]) -> None:
+        for user_id, login_at in logins.items():
+            user = self.store.users.get(user_id)
+            if user is not None and (
+                user.last_login_at is None or user.last_login_at < login_at
+            ):
+                user.last_login_at = login_at
+                self._bump_version(user_id)
+
+    async def iter_emails(self, batch_size: int) -> AsyncIterator[str]:
+        for email in list(self.store.user_ids_by_email):
+            yield email
+
+    async def archive_inactive_users(
+        self, deactivated_before: timedelta, batch_size: int
+    ) -> int:
+        due_before = datetime.now(timezone.utc) - deactivated_before
+        due_user_ids = [
+            user_id
+            for user_id, user in self.store.users.items()
+            if not user.is_active
+            and user.deactivated_at is not None
+            and user.deactivated_at < due_before
+        ][:batch_size]
+        for user_id in due_user_ids:
+            self.store.archived_users[user_id] = self.store.users.pop(user_id)
+        return len(due_user_ids)
+
+    async def get_user_stats(self) -> Tuple[int, int]:
+        users = self.store.users.values()
+        total = len(users) + len(self.store.archived_users)
+        return total, sum(user.is_active for user in users)
+
+    async def estimate_user_stats(self) -> Tuple[int, Union[int, None]]:
+        return await self.get_user_stats()
+
+    async def reconcile_user_stats(self) -> Tuple[int, int]:
+        return await self.get_user_stats()
+
+
+in_memory_user_store = InMemoryUserStore()
+
+
+def in_memory_sessionmaker() -> InMemorySession:
+    return InMemorySession(in_memory_user_store)
+
+
+async def get_in_memory_db() -> Generator:
+    """Dependency override serving the API from the in-memory storage"""
+    yield in_memory_sessionmaker()
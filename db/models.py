@@ -1,8 +1,16 @@
 import uuid
 
+from sqlalchemy import BigInteger
 from sqlalchemy import Boolean
 from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import DDL
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import Index
+from sqlalchemy import Integer
 from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 
@@ -13,13 +21,155 @@ from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
+# users are spread over this many hash partitions of user_id
+USERS_HASH_PARTITIONS = 16
+
+# counters of users are spread over this many rows to avoid a hot row
+USER_STATS_COUNTER_SLOTS = 16
+
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # finds the users due for archival without scanning the active ones
+        Index(
+            "ix_users_deactivated_at",
+            "deactivated_at",
+            postgresql_where="is_active = false",
+        ),
+        {"postgresql_partition_by": "HASH (user_id)"},
+    )
 
     user_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     surname = Column(String, nullable=False)
-    email = Column(String, nullable=False, unique=True)
+    # unique index on a partitioned table must contain user_id,
+    # so uniqueness of emails is kept by the user_emails table
+    email = Column(String, nullable=False)
     is_active = Column(Boolean(), default=True)
     hashed_password = Column(String, nullable=False)
+    last_login_at = Column(DateTime(timezone=True), nullable=True)
+    deactivated_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ArchivedUser(Base):
+    """User that stayed deactivated past the retention, moved out of users"""
+
+    __tablename__ = "users_archive"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    name = Column(String, nullable=False)
+    surname = Column(String, nullable=False)
+    email = Column(String, nullable=False)
+    is_active = Column(Boolean(), default=False)
+    hashed_password = Column(String, nullable=False)
+    last_login_at = Column(DateTime(timezone=True), nullable=True)
+    deactivated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class UserEmail(Base):
+    """Global lookup of user_id by email, kept in sync by a trigger on users"""
+
+    __tablename__ = "user_emails"
+
+    email = Column(String, primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+
+
+class UserStatsCounter(Base):
+    """Slice of the user counts, the counts are sums over all slots"""
+
+    __tablename__ = "user_stats_counters"
+
+    slot = Column(Integer, primary_key=True)
+    total = Column(BigInteger, nullable=False, default=0)
+    active = Column(BigInteger, nullable=False, default=0)
+
+
+class Job(Base):
+    """Background job, claimed by workers with FOR UPDATE SKIP LOCKED"""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # the queue is scanned only for jobs that still have to run
+        Index(
+            "ix_jobs_runnable",
+            "run_after",
+            postgresql_where="status IN ('queued', 'running')",
+        ),
+    )
+
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_type = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    # queued, running, succeeded or failed
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    # progress kept across attempts, so a retry continues where it stopped
+    progress = Column(JSONB, nullable=False, default=dict)
+    error = Column(String, nullable=True)
+    # a queued job runs after it, a running one is taken over after it
+    run_after = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+for remainder in range(USERS_HASH_PARTITIONS):
+    event.listen(
+        User.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TABLE users_p{remainder} PARTITION OF users "
+            f"FOR VALUES WITH (MODULUS {USERS_HASH_PARTITIONS}, REMAINDER {remainder})"
+        ),
+    )
+
+# rows written to users by any path (COPY, raw SQL) claim their email,
+# an email taken by another user fails with a unique violation
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE FUNCTION claim_user_email() RETURNS trigger AS $$
+        BEGIN
+            PERFORM 1 FROM user_emails
+            WHERE email = NEW.email AND user_id = NEW.user_id;
+            IF NOT FOUND THEN
+                IF TG_OP = 'UPDATE' THEN
+                    DELETE FROM user_emails
+                    WHERE email = OLD.email AND user_id = OLD.user_id;
+                END IF;
+                INSERT INTO user_emails (email, user_id)
+                VALUES (NEW.email, NEW.user_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ),
+)
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL(
+        "CREATE TRIGGER users_claim_email AFTER INSERT OR UPDATE OF email ON users "
+        "FOR EACH ROW EXECUTE FUNCTION claim_user_email()"
+    ),
+)
+event.listen(
+    User.__table__,
+    "before_drop",
+    DDL("DROP TRIGGER IF EXISTS users_claim_email ON users"),
+)
+event.listen(
+    User.__table__, "after_drop", DDL("DROP FUNCTION IF EXISTS claim_user_email()")
+)
@@ -0,0 +1,96 @@
+from abc import ABC
+from abc import abstractmethod
+from datetime import datetime
+from datetime import timedelta
+from typing import AsyncIterator
+from typing import Dict
+from typing import List
+from typing import Tuple
+from typing import Union
+from uuid import UUID
+
+from db.models import User
+
+########################################
+# BLOCK WITH INTERFACE OF USER STORAGE #
+########################################
+
+
+class UserRepository(ABC):
+    """Interface of user storage used by the actions
+
+    UserDAL implements it on top of postgres, InMemoryUserDAL keeps users in
+    process memory for benchmarks of the application layer alone.
+    """
+
+    @abstractmethod
+    async def create_user(
+        self, name: str, surname: str, email: str, hashed_password: str
+    ) -> Union[User, None]:
+        """Returns None when the email is already taken"""
+
+    @abstractmethod
+    async def create_users(
+        self, users: List[Dict[str, str]]
+    ) -> List[Union[User, None]]:
+        """Creates users given as create_user arguments, None where the email is taken"""
+
+    @abstractmethod
+    async def delete_user(self, user_id: UUID) -> Union[UUID, None]:
+        pass
+
+    @abstractmethod
+    async def delete_users(self, user_ids: List[UUID]) -> List[UUID]:
+        pass
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: UUID) -> Union[User, None]:
+        pass
+
+    @abstractmethod
+    async def get_user_with_version_by_id(
+        self, user_id: UUID
+    ) -> Union[Tuple[User, int], None]:
+        pass
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> Union[User, None]:
+        pass
+
+    @abstractmethod
+    async def get_users_by_emails(self, emails: List[str]) -> List[User]:
+        pass
+
+    @abstractmethod
+    async def update_user(self, user_id: UUID, **kwargs) -> Union[UUID, None]:
+        pass
+
+    @abstractmethod
+    async def update_users(self, user_ids: List[UUID], **kwargs) -> List[UUID]:
+        pass
+
+    @abstractmethod
+    async def update_last_login_at(self, logins: Dict[UUID, datetime]) -> None:
+        pass
+
+    @abstractmethod
+    def iter_emails(self, batch_size: int) -> AsyncIterator[str]:
+        pass
+
+    @abstractmethod
+    async def archive_inactive_users(
+        self, deactivated_before: timedelta, batch_size: int
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def get_user_stats(self) -> Tuple[int, int]:
+        pass
+
+    @abstractmethod
+    async def estimate_user_stats(self) -> Tuple[int, Union[int, None]]:
+        pass
+
+    @abstractmethod
+    async def reconcile_user_stats(self) -> Tuple[int, int]:
+        pass
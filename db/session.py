@@ -1,27 +1,145 @@
+import asyncio
+import time
+from typing import Callable
 from typing import Generator
+from typing import Union
+from uuid import uuid4
 
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 import settings
+from db.dals import UserDAL
+from db.memory import in_memory_sessionmaker
+from db.memory import InMemorySession
+from db.memory import InMemoryUserDAL
+from db.repository import UserRepository
+from deadlines import remaining_time
+from metrics import metrics
+from metrics import MovingAverage
 
 ##############################################
 # BLOCK FOR COMMON INTERACTION WITH DATABASE #
 ##############################################
 
 
-# create async engine for interaction with database
-engine = create_async_engine(url=settings.REAL_DATABASE_URL, future=True, echo=True)
+pool_wait_seconds = metrics.histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5],
+)
+# recent pool wait, admission control sheds load when it grows
+pool_wait = MovingAverage()
 
-# create session for the interaction with database
-async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool measuring how long checkouts wait for a connection
+
+    A checkout never waits past the deadline of the current request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._default_timeout = self._timeout
+
+    def _do_get(self):
+        remaining = remaining_time()
+        self._timeout = (
+            self._default_timeout
+            if remaining is None
+            else min(self._default_timeout, remaining)
+        )
+        started_at = time.perf_counter()
+        connection = super()._do_get()
+        waited = time.perf_counter() - started_at
+        pool_wait_seconds.observe(waited)
+        pool_wait.update(waited)
+        return connection
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_request_deadline(session: Session, transaction, connection) -> None:
+    """Cancels the statements of the transaction when the request deadline passes"""
+    remaining = remaining_time()
+    if remaining is not None:
+        # a zero statement_timeout would disable the limit
+        timeout_ms = max(int(remaining * 1000), 1)
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+# engine and session factory are created lazily, normally by the app lifespan
+_engine: Union[AsyncEngine, None] = None
+_async_session: Union[sessionmaker, None] = None
+
+
+def get_engine() -> AsyncEngine:
+    """Creates the async engine for interaction with database on first use"""
+    global _engine, _async_session
+    if _engine is None:
+        _engine = create_async_engine(
+            url=settings.REAL_DATABASE_URL,
+            future=True,
+            poolclass=TimedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+        _async_session = sessionmaker(
+            _engine, expire_on_commit=False, class_=AsyncSession
+        )
+    return _engine
+
+
+def get_sessionmaker() -> Callable:
+    if settings.USER_REPOSITORY == "memory":
+        return in_memory_sessionmaker
+    get_engine()
+    return _async_session
+
+
+def get_user_dal(session: Union[AsyncSession, InMemorySession]) -> UserRepository:
+    """Builds the user storage for the session of the configured backend"""
+    if isinstance(session, InMemorySession):
+        return InMemoryUserDAL(session.store)
+    return UserDAL(session)
+
+
+async def dispose_engine() -> None:
+    global _engine, _async_session
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _async_session = None
+
+
+async def _warm_up_connection(engine: AsyncEngine) -> None:
+    async with engine.connect() as connection:
+        session = AsyncSession(bind=connection)
+        user_dal = UserDAL(session)
+        # run the hot queries once, so their statements are compiled and prepared
+        await user_dal.get_user_by_id(user_id=uuid4())
+        await user_dal.get_user_with_version_by_id(user_id=uuid4())
+        await user_dal.get_user_by_email(email="")
+        await session.close()
+        await connection.rollback()
+
+
+async def warm_up_engine(connections: int) -> None:
+    """Pre-opens pool connections and warms their statement caches"""
+    if settings.USER_REPOSITORY == "memory":
+        return
+    engine = get_engine()
+    await asyncio.gather(*(_warm_up_connection(engine) for _ in range(connections)))
 
 
 async def get_db() -> Generator:
     """Dependency for getting async session"""
     try:
-        session: AsyncSession = async_session()
+        session: AsyncSession = get_sessionmaker()()
         yield session
     finally:
         await session.close()
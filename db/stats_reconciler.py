@@ -0,0 +1,78 @@
+import asyncio
+from logging import getLogger
+from typing import Callable
+from typing import Union
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+import settings
+from db.session import get_sessionmaker
+from db.session import get_user_dal
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+###################################################
+# BLOCK FOR RECONCILIATION OF USER STATS COUNTERS #
+###################################################
+
+reconciliations = metrics.counter(
+    "user_stats_reconciliations_total", "Recounts of users that replaced the counters"
+)
+counter_drift = metrics.gauge(
+    "user_stats_counter_drift", "Difference of the total counter from the last recount"
+)
+
+
+class UserStatsReconciler:
+    """Periodically replaces the user counters with an exact count
+
+    The counters only drift when users are changed outside of the DAL, so the
+    full count runs rarely and in the background instead of on each request.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        session_factory: Callable[[], sessionmaker] = get_sessionmaker,
+    ):
+        self.interval = interval
+        self.session_factory = session_factory
+        self._task: Union[asyncio.Task, None] = None
+
+    async def reconcile(self) -> bool:
+        try:
+            async with self.session_factory()() as session, session.begin():
+                user_dal = get_user_dal(session)
+                counted_total, _ = await user_dal.get_user_stats()
+                total, _ = await user_dal.reconcile_user_stats()
+        except (OSError, SQLAlchemyError) as err:
+            logger.error(f"Reconciliation of user stats failed: {err}")
+            return False
+        reconciliations.inc()
+        counter_drift.set(counted_total - total)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.reconcile()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+user_stats_reconciler = UserStatsReconciler(
+    interval=settings.USER_STATS_RECONCILE_SECONDS
+)
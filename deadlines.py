@@ -0,0 +1,43 @@
+"""Deadline of the current request, shared by the API and the database layer"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from typing import Union
+
+from metrics import metrics
+
+# monotonic time the current request has to be finished by
+_request_deadline: ContextVar[Union[float, None]] = ContextVar(
+    "request_deadline", default=None
+)
+
+timed_out_requests = metrics.counter(
+    "request_deadline_exceeded_total", "Requests answered with 504 by the reason"
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextmanager
+def deadline_after(timeout: float) -> Iterator[float]:
+    """Sets the deadline of the work done inside the block"""
+    deadline = time.monotonic() + timeout
+    token = _request_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_time() -> Union[float, None]:
+    """Seconds left until the deadline, None when there is no deadline"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return remaining
@@ -0,0 +1,270 @@
+"""Imports users from a CSV or NDJSON file through COPY into a staging table
+
+Rows are validated with the CreateUser rules, passwords are hashed by a pool
+of processes (or taken as they are with --pre-hashed, from a hashed_password
+field), and each batch is merged into users in its own transaction. After a
+batch is committed its position is saved to the checkpoint file, so running
+the same command again resumes after the last committed batch.
+
+    python import_users.py students.csv --batch-size 10000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from typing import Union
+from uuid import uuid4
+
+import asyncpg
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+import settings
+from api.models import CreateUser
+from db.dals import USER_CHANGES_CHANNEL
+from db.models import USER_STATS_COUNTER_SLOTS
+from hashing import Hasher
+from hashing import pwd_context
+
+logger = logging.getLogger("import_users")
+
+##################################
+# BLOCK FOR BULK IMPORT OF USERS #
+##################################
+
+STAGING_COLUMNS = ["line", "user_id", "name", "surname", "email", "hashed_password"]
+
+CREATE_STAGING_TABLE = """
+    CREATE TEMP TABLE users_import (
+        line bigint NOT NULL,
+        user_id uuid NOT NULL,
+        name varchar NOT NULL,
+        surname varchar NOT NULL,
+        email varchar NOT NULL,
+        hashed_password varchar NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+# the first row of an email wins, also within the batch
+CLAIM_EMAILS = """
+    INSERT INTO user_emails (email, user_id)
+    SELECT DISTINCT ON (email) email, user_id FROM users_import ORDER BY email, line
+    ON CONFLICT (email) DO NOTHING
+"""
+
+# only the rows whose email was claimed by this import are inserted
+MERGE_USERS = f"""
+    WITH imported AS (
+        INSERT INTO users (user_id, name, surname, email, is_active, hashed_password)
+        SELECT i.user_id, i.name, i.surname, i.email, true, i.hashed_password
+        FROM users_import i
+        JOIN user_emails e ON e.email = i.email AND e.user_id = i.user_id
+        RETURNING user_id, email
+    )
+    SELECT count(pg_notify(
+        '{USER_CHANGES_CHANNEL}',
+        json_build_object(
+            'operation', 'create', 'user_id', user_id, 'email', email
+        )::text
+    ))
+    FROM imported
+"""
+
+COUNT_USERS = """
+    INSERT INTO user_stats_counters (slot, total, active) VALUES ($1, $2, $2)
+    ON CONFLICT (slot) DO UPDATE SET
+        total = user_stats_counters.total + excluded.total,
+        active = user_stats_counters.active + excluded.active
+"""
+
+
+@dataclass
+class ImportStats:
+    imported: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+
+
+class ImportRow(CreateUser):
+    line: int
+
+
+def read_rows(path: str, file_format: str) -> Iterator[Tuple[int, Dict]]:
+    """Yields the rows of the file with their line, starting at 1"""
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            yield from enumerate(csv.DictReader(source), start=1)
+            return
+        for line, text in enumerate(source, start=1):
+            if text.strip():
+                yield line, json.loads(text)
+
+
+def validate_row(line: int, row: Dict, pre_hashed: bool) -> Union[ImportRow, None]:
+    # other columns of legacy exports are ignored
+    fields = {field: row.get(field) for field in ("name", "surname", "email")}
+    # a hash is carried in the password field, it is only checked to be bcrypt
+    fields["password"] = row.get("hashed_password" if pre_hashed else "password")
+    try:
+        user = ImportRow(line=line, **fields)
+    except (ValidationError, HTTPException) as err:
+        detail = err.detail if isinstance(err, HTTPException) else err.errors()
+        logger.warning(f"Row {line} rejected: {detail}")
+        return None
+    if pre_hashed and pwd_context.identify(user.password) is None:
+        logger.warning(f"Row {line} rejected: hashed_password is not a bcrypt hash")
+        return None
+    return user
+
+
+def load_checkpoint(path: str, source: str) -> int:
+    """Returns the rows of the source already imported"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as checkpoint:
+        state = json.load(checkpoint)
+    if state["source"] != os.path.abspath(source):
+        raise ValueError(f"Checkpoint {path} belongs to {state['source']}.")
+    return state["rows"]
+
+
+def save_checkpoint(path: str, source: str, rows: int) -> None:
+    # written aside and renamed, so an interruption never leaves a torn file
+    with open(f"{path}.tmp", "w", encoding="utf-8") as checkpoint:
+        json.dump({"source": os.path.abspath(source), "rows": rows}, checkpoint)
+    os.replace(f"{path}.tmp", path)
+
+
+async def hash_passwords(
+    executor: Union[Executor, None], users: List[ImportRow]
+) -> List[str]:
+    passwords = [user.password for user in users]
+    if executor is None:
+        return passwords
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, Hasher.get_password_hash, p)
+            for p in passwords
+        )
+    )
+
+
+async def merge_batch(
+    connection: asyncpg.Connection, users: List[ImportRow], hashed_passwords: List[str]
+) -> int:
+    """Copies the batch into the staging table and merges it, returns imported rows"""
+    records = [
+        (user.line, uuid4(), user.name, user.surname, user.email, hashed_password)
+        for user, hashed_password in zip(users, hashed_passwords)
+    ]
+    async with connection.transaction():
+        await connection.copy_records_to_table(
+            "users_import", records=records, columns=STAGING_COLUMNS
+        )
+        await connection.execute(CLAIM_EMAILS)
+        imported = await connection.fetchval(MERGE_USERS)
+        if imported:
+            await connection.execute(
+                COUNT_USERS, random.randrange(USER_STATS_COUNTER_SLOTS), imported
+            )
+    return imported
+
+
+async def import_users(
+    path: str,
+    dsn: str,
+    file_format: str,
+    checkpoint_path: str,
+    batch_size: int,
+    workers: int,
+    pre_hashed: bool,
+) -> ImportStats:
+    stats = ImportStats()
+    done_rows = load_checkpoint(checkpoint_path, path)
+    rows = islice(read_rows(path, file_format), done_rows, None)
+    executor = None if pre_hashed else ProcessPoolExecutor(max_workers=workers)
+    connection = await asyncpg.connect(dsn)
+    try:
+        await connection.execute(CREATE_STAGING_TABLE)
+        started_at = time.perf_counter()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            users = [
+                user
+                for user in (validate_row(line, row, pre_hashed) for line, row in batch)
+                if user is not None
+            ]
+            imported = 0
+            if users:
+                hashed_passwords = await hash_passwords(executor, users)
+                imported = await merge_batch(connection, users, hashed_passwords)
+            done_rows += len(batch)
+            save_checkpoint(checkpoint_path, path, done_rows)
+            stats.imported += imported
+            stats.duplicates += len(users) - imported
+            stats.rejected += len(batch) - len(users)
+            logger.info(
+                f"{done_rows} rows done, {stats.imported} imported, "
+                f"{stats.imported / (time.perf_counter() - started_at):.0f} rows/s"
+            )
+    finally:
+        await connection.close()
+        if executor is not None:
+            executor.shutdown()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV with a header row, or NDJSON")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument(
+        "--dsn", default="".join(settings.REAL_DATABASE_URL.split("+asyncpg"))
+    )
+    parser.add_argument("--checkpoint", help="defaults to <path>.checkpoint")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--pre-hashed",
+        action="store_true",
+        help="rows carry a bcrypt hashed_password instead of a password",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    file_format = args.format or (
+        "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv"
+    )
+    stats = asyncio.run(
+        import_users(
+            path=args.path,
+            dsn=args.dsn,
+            file_format=file_format,
+            checkpoint_path=args.checkpoint or f"{args.path}.checkpoint",
+            batch_size=args.batch_size,
+            workers=args.workers,
+            pre_hashed=args.pre_hashed,
+        )
+    )
+    logger.info(
+        f"Import finished: {stats.imported} imported, "
+        f"{stats.duplicates} duplicate emails, {stats.rejected} rejected"
+    )
+
+
+if __name__ == "__main__":
+    main()
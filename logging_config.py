@@ -0,0 +1,122 @@
+"""Queue based structured logging, records are formatted and written in a thread"""
+import json
+import logging
+import random
+import sys
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from queue import Full
+from queue import Queue
+from typing import Dict
+
+import settings
+from metrics import metrics
+
+#########################################
+# BLOCK WITH NON-BLOCKING LOGGING SETUP #
+#########################################
+
+dropped_records = metrics.counter(
+    "log_records_dropped_total", "Log records dropped because the queue was full"
+)
+sampled_out_records = metrics.counter(
+    "log_records_sampled_out_total", "Log records skipped by per logger sampling"
+)
+
+# loggers configured by uvicorn with their own synchronous handlers
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+def parse_mapping(value: str) -> Dict[str, str]:
+    """Parses "name=value,other=value" settings"""
+    mapping = {}
+    for item in value.split(","):
+        if item.strip():
+            name, _, item_value = item.partition("=")
+            mapping[name.strip()] = item_value.strip()
+    return mapping
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps the configured share of records of a logger and its children"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, logger_name: str) -> float:
+        while logger_name:
+            if logger_name in self.rates:
+                return self.rates[logger_name]
+            logger_name = logger_name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        sampled_out_records.inc()
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queues records without formatting them and drops them when the queue is full"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting is left to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            dropped_records.inc()
+
+
+def setup_logging() -> QueueListener:
+    """Routes all records through a bounded queue to a stdout writer thread"""
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+    log_queue = Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(
+        SamplingFilter(
+            {
+                name: float(rate)
+                for name, rate in parse_mapping(settings.LOG_SAMPLING).items()
+            }
+        )
+    )
+    root_logger = logging.getLogger()
+    root_logger.setLevel(settings.LOG_LEVEL)
+    root_logger.addHandler(queue_handler)
+    for name in UVICORN_LOGGERS:
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    for name, level in parse_mapping(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+def shutdown_logging(listener: QueueListener) -> None:
+    """Writes out the queued records and detaches the queue handler"""
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        if isinstance(handler, DroppingQueueHandler):
+            root_logger.removeHandler(handler)
+    listener.stop()
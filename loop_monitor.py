@@ -0,0 +1,101 @@
+"""Lag of the event loop, with the stacks of the code blocking it"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from logging import getLogger
+from typing import Union
+
+import settings
+from metrics import metrics
+
+logger = getLogger(__name__)
+
+loop_lag_seconds = metrics.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a callback scheduled for a known time",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5],
+)
+loop_blocked = metrics.counter(
+    "event_loop_blocked_total", "Times the event loop was blocked past the threshold"
+)
+
+
+class EventLoopMonitor:
+    """Measures how late the event loop wakes up and catches what blocks it
+
+    A probe task sleeps for `interval` and records how much later than that
+    it woke up. A watchdog thread watches the probe, and when the loop hasn't
+    run it for `threshold` past its schedule, it logs the stack the loop
+    thread is stuck in, once per stall.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._task: Union[asyncio.Task, None] = None
+        self._watchdog: Union[threading.Thread, None] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Union[int, None] = None
+        # monotonic time the probe is due to run next
+        self._due_at = 0.0
+
+    async def _probe(self) -> None:
+        while True:
+            self._due_at = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - self._due_at, 0.0)
+            loop_lag_seconds.observe(lag)
+
+    def check(self) -> bool:
+        """Logs the stack of the loop thread when it is blocked, runs in the watchdog"""
+        lag = time.monotonic() - self._due_at
+        if lag < self.threshold:
+            return False
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return False
+        stack = "".join(traceback.format_stack(frame))
+        loop_blocked.inc()
+        logger.warning(
+            f"Event loop blocked for {lag * 1000:.0f} ms, at:\n{stack.rstrip()}"
+        )
+        return True
+
+    def _watch(self) -> None:
+        reported_due_at = None
+        while not self._stopped.wait(self.threshold / 2):
+            due_at = self._due_at
+            # a stall is reported once, the probe moves due_at when it is over
+            if due_at != reported_due_at and self.check():
+                reported_due_at = due_at
+
+    def start(self) -> None:
+        if self._task is None:
+            self._loop_thread_id = threading.get_ident()
+            self._due_at = time.monotonic() + self.interval
+            self._task = asyncio.create_task(self._probe())
+            self._stopped.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="event-loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopped.set()
+            self._watchdog.join()
+            self._watchdog = None
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+event_loop_monitor = EventLoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_SECONDS,
+    threshold=settings.LOOP_MONITOR_THRESHOLD_SECONDS,
+)
@@ -1,16 +1,88 @@
-import uvicorn
+import asyncio
+from contextlib import asynccontextmanager
+from logging import getLogger
+
 from fastapi import APIRouter
 from fastapi import FastAPI
+from sqlalchemy.exc import SQLAlchemyError
 
+import settings
+from api.batch_handler import batch_router
+from api.change_feed import user_change_feed
+from api.diagnostics_handler import diagnostics_router
+from api.email_filter import email_availability
 from api.handlers import user_router
+from api.health_handler import health_router
+from api.jobs import job_worker_pool
+from api.jobs_handler import jobs_router
+from api.jwks_handler import jwks_router
 from api.login_handler import login_router
+from api.metrics_handler import metrics_router
+from api.middlewares.admission import AdmissionBudget
+from api.middlewares.admission import AdmissionControlMiddleware
+from api.middlewares.deadline import DeadlineMiddleware
+from api.middlewares.profiling import ProfilingMiddleware
+from api.middlewares.server_timing import ServerTimingMiddleware
+from api.middlewares.traffic_capture import traffic_recorder
+from api.middlewares.traffic_capture import TrafficCaptureMiddleware
+from db.archiver import user_archiver
+from db.login_tracker import last_login_tracker
+from db.session import dispose_engine
+from db.session import pool_wait
+from db.session import warm_up_engine
+from db.stats_reconciler import user_stats_reconciler
+from logging_config import parse_mapping
+from logging_config import setup_logging
+from logging_config import shutdown_logging
+from loop_monitor import event_loop_monitor
+from server import run
+
+logger = getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = setup_logging()
+    if settings.LOOP_MONITOR_ENABLED:
+        event_loop_monitor.start()
+    if settings.TRAFFIC_CAPTURE_ENABLED:
+        traffic_recorder.start()
+    app.state.ready = False
+    try:
+        await warm_up_engine(settings.DB_POOL_WARMUP_CONNECTIONS)
+        if settings.USER_REPOSITORY == "postgres":
+            await user_change_feed.start()
+    except (OSError, SQLAlchemyError) as err:
+        logger.error(f"Database warm-up failed: {err}")
+    else:
+        app.state.ready = True
+    last_login_tracker.start()
+    user_stats_reconciler.start()
+    user_archiver.start()
+    if settings.USER_REPOSITORY == "postgres":
+        job_worker_pool.start()
+    # checks go to the database until all taken emails are loaded
+    load_emails = asyncio.create_task(email_availability.load())
+    yield
+    load_emails.cancel()
+    app.state.ready = False
+    await job_worker_pool.stop()
+    await user_archiver.stop()
+    await user_stats_reconciler.stop()
+    await last_login_tracker.stop()
+    await user_change_feed.stop()
+    await dispose_engine()
+    traffic_recorder.stop()
+    await event_loop_monitor.stop()
+    shutdown_logging(log_listener)
+
 
 #########################
 # BLOCK WITH API ROUTES #
 #########################
 
 # create instance of the app
-app = FastAPI(title="oxford-university")
+app = FastAPI(title="oxford-university", lifespan=lifespan)
 
 # create the instance for the routes
 main_api_router = APIRouter()
@@ -18,8 +90,83 @@ main_api_router = APIRouter()
 # set routes to the app instance
 main_api_router.include_router(user_router, prefix="/user", tags=["user"])
 main_api_router.include_router(login_router, prefix="/login", tags=["login"])
+main_api_router.include_router(health_router, prefix="/health", tags=["health"])
+main_api_router.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
+main_api_router.include_router(jobs_router, prefix="/jobs", tags=["jobs"])
+main_api_router.include_router(batch_router, prefix="/batch", tags=["batch"])
+main_api_router.include_router(jwks_router, prefix="/.well-known", tags=["login"])
+if settings.DIAGNOSTICS_ENABLED:
+    main_api_router.include_router(
+        diagnostics_router, prefix="/diagnostics", tags=["diagnostics"]
+    )
 app.include_router(main_api_router)
 
+#########################
+# BLOCK WITH MIDDLEWARE #
+#########################
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        directory=settings.PROFILING_DIR,
+        max_files=settings.PROFILING_MAX_FILES,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        header=settings.PROFILING_HEADER,
+        token=settings.PROFILING_TOKEN,
+    )
+
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        default=AdmissionBudget(
+            "default",
+            max_concurrency=settings.ADMISSION_DEFAULT_CONCURRENCY,
+            max_queue=settings.ADMISSION_DEFAULT_QUEUE,
+            target_wait=settings.ADMISSION_TARGET_WAIT_SECONDS,
+            max_wait=settings.ADMISSION_MAX_WAIT_SECONDS,
+            pool_wait=lambda: pool_wait.value,
+        ),
+        expensive=AdmissionBudget(
+            "expensive",
+            max_concurrency=settings.ADMISSION_EXPENSIVE_CONCURRENCY,
+            max_queue=settings.ADMISSION_EXPENSIVE_QUEUE,
+            target_wait=settings.ADMISSION_TARGET_WAIT_SECONDS,
+            max_wait=settings.ADMISSION_MAX_WAIT_SECONDS,
+            pool_wait=lambda: pool_wait.value,
+        ),
+        expensive_routes=[("POST", "/login/token"), ("POST", "/user/")],
+        # probes, scrapes, long-lived streams and diagnostics of an overloaded
+        # worker must not take or wait for slots
+        exempt=["/health", "/metrics", "/user/changes", "/diagnostics"],
+        retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+
+# the deadline wraps admission, so time spent queued counts against it
+app.add_middleware(
+    DeadlineMiddleware,
+    default_timeout=settings.REQUEST_TIMEOUT_SECONDS,
+    max_timeout=settings.REQUEST_TIMEOUT_MAX_SECONDS,
+    route_timeouts={
+        route: float(timeout)
+        for route, timeout in parse_mapping(settings.REQUEST_TIMEOUTS).items()
+    },
+    header=settings.REQUEST_TIMEOUT_HEADER,
+    exempt=["/health", "/metrics", "/user/changes", "/diagnostics"],
+)
+
+# outermost, so the captured timing is what the client saw
+if settings.TRAFFIC_CAPTURE_ENABLED:
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        recorder=traffic_recorder,
+        sample_rate=settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+        max_body_bytes=settings.TRAFFIC_CAPTURE_MAX_BODY_BYTES,
+        exempt=["/health", "/metrics", "/user/changes"],
+    )
+
 if __name__ == "__main__":
-    # run app on the host and port
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # run app with the server settings
+    run()
@@ -0,0 +1,118 @@
+"""In-process metrics rendered in the prometheus text format"""
+from bisect import bisect_left
+from typing import Dict
+from typing import Sequence
+from typing import Tuple
+
+##################################
+# BLOCK WITH APPLICATION METRICS #
+##################################
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+
+def _render_labels(labels: LabelValues, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + value
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{_render_labels(labels)} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = sorted(buckets)
+        self.values: Dict[LabelValues, Tuple[list, list]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        if key not in self.values:
+            # per bucket counts, the last one is +Inf, and [count, sum]
+            self.values[key] = ([0] * (len(self.buckets) + 1), [0, 0.0])
+        bucket_counts, totals = self.values[key]
+        bucket_counts[bisect_left(self.buckets, value)] += 1
+        totals[0] += 1
+        totals[1] += value
+
+    def samples(self):
+        for labels, (bucket_counts, totals) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ["+Inf"], bucket_counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket{_render_labels(labels, le=str(bound))} "
+                    f"{cumulative}"
+                )
+            yield f"{self.name}_count{_render_labels(labels)} {totals[0]}"
+            yield f"{self.name}_sum{_render_labels(labels)} {totals[1]}"
+
+
+class MovingAverage:
+    """Exponentially weighted moving average, recent values weigh the most"""
+
+    def __init__(self, weight: float = 0.2):
+        self.weight = weight
+        self.value = 0.0
+
+    def update(self, value: float) -> None:
+        self.value += self.weight * (value - self.value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float]
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
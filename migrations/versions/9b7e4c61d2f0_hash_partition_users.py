@@ -0,0 +1,116 @@
+"""hash partition users
+
+Moves users to a table hash-partitioned on user_id. A unique index on a
+partitioned table has to contain the partition key, so uniqueness of emails
+moves to the user_emails lookup table, which a trigger on users keeps in sync.
+
+Revision ID: 9b7e4c61d2f0
+Revises: 3f1c9a2d8e41
+Create Date: 2026-10-19 13:40:02.184113
+
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9b7e4c61d2f0"
+down_revision: Union[str, None] = "3f1c9a2d8e41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USERS_HASH_PARTITIONS = 16
+
+USERS_COLUMNS = (
+    "user_id, name, surname, email, is_active, hashed_password, last_login_at"
+)
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE users RENAME TO users_unpartitioned")
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("surname", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("last_login_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("user_id", name="users_partitioned_pkey"),
+        postgresql_partition_by="HASH (user_id)",
+    )
+    for remainder in range(USERS_HASH_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE users_p{remainder} PARTITION OF users "
+            f"FOR VALUES WITH (MODULUS {USERS_HASH_PARTITIONS}, REMAINDER {remainder})"
+        )
+    op.create_table(
+        "user_emails",
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.PrimaryKeyConstraint("email"),
+    )
+    # rows are copied before the trigger exists, so they don't pay for it
+    op.execute(
+        "INSERT INTO user_emails (email, user_id) "
+        "SELECT email, user_id FROM users_unpartitioned"
+    )
+    op.execute(
+        f"INSERT INTO users ({USERS_COLUMNS}) "
+        f"SELECT {USERS_COLUMNS} FROM users_unpartitioned"
+    )
+    op.execute(
+        """
+        CREATE FUNCTION claim_user_email() RETURNS trigger AS $$
+        BEGIN
+            PERFORM 1 FROM user_emails
+            WHERE email = NEW.email AND user_id = NEW.user_id;
+            IF NOT FOUND THEN
+                IF TG_OP = 'UPDATE' THEN
+                    DELETE FROM user_emails
+                    WHERE email = OLD.email AND user_id = OLD.user_id;
+                END IF;
+                INSERT INTO user_emails (email, user_id)
+                VALUES (NEW.email, NEW.user_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER users_claim_email AFTER INSERT OR UPDATE OF email ON users "
+        "FOR EACH ROW EXECUTE FUNCTION claim_user_email()"
+    )
+    op.drop_table("users_unpartitioned")
+    op.execute("ALTER INDEX users_partitioned_pkey RENAME TO users_pkey")
+    op.execute("ANALYZE users")
+    op.execute("ANALYZE user_emails")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE users RENAME TO users_partitioned")
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("surname", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("last_login_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("user_id", name="users_unpartitioned_pkey"),
+        sa.UniqueConstraint("email"),
+    )
+    op.execute(
+        f"INSERT INTO users ({USERS_COLUMNS}) "
+        f"SELECT {USERS_COLUMNS} FROM users_partitioned"
+    )
+    op.drop_table("users_partitioned")
+    op.execute("DROP FUNCTION claim_user_email()")
+    op.drop_table("user_emails")
+    op.execute("ALTER INDEX users_unpartitioned_pkey RENAME TO users_pkey")
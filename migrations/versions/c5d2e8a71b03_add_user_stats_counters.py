@@ -0,0 +1,38 @@
+"""add user_stats_counters
+
+Revision ID: c5d2e8a71b03
+Revises: 9b7e4c61d2f0
+Create Date: 2026-10-19 15:02:17.804511
+
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d2e8a71b03"
+down_revision: Union[str, None] = "9b7e4c61d2f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_stats_counters",
+        sa.Column("slot", sa.Integer(), nullable=False),
+        sa.Column("total", sa.BigInteger(), nullable=False),
+        sa.Column("active", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("slot"),
+    )
+    # the counters start from the users that already exist
+    op.execute(
+        "INSERT INTO user_stats_counters (slot, total, active) "
+        "SELECT 0, count(*), count(*) FILTER (WHERE is_active) FROM users"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_stats_counters")
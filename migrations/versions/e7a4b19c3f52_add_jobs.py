@@ -0,0 +1,59 @@
+"""add jobs
+
+Revision ID: e7a4b19c3f52
+Revises: c5d2e8a71b03
+Create Date: 2026-10-19 18:41:05.227930
+
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a4b19c3f52"
+down_revision: Union[str, None] = "c5d2e8a71b03"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("job_id", sa.UUID(), nullable=False),
+        sa.Column("job_type", sa.String(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("progress", postgresql.JSONB(), nullable=False),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column(
+            "run_after",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("job_id"),
+    )
+    op.create_index(
+        "ix_jobs_runnable",
+        "jobs",
+        ["run_after"],
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_runnable", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,67 @@
+"""add users archive
+
+Users deactivated longer than the retention are moved from users to
+users_archive, deactivated_at tells when. Users deactivated before this
+revision are taken as deactivated now.
+
+Revision ID: f2b8d35c6a97
+Revises: e7a4b19c3f52
+Create Date: 2026-10-19 19:26:41.503816
+
+"""
+from typing import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b8d35c6a97"
+down_revision: Union[str, None] = "e7a4b19c3f52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users", sa.Column("deactivated_at", sa.DateTime(timezone=True), nullable=True)
+    )
+    op.execute("UPDATE users SET deactivated_at = now() WHERE is_active = false")
+    op.create_index(
+        "ix_users_deactivated_at",
+        "users",
+        ["deactivated_at"],
+        postgresql_where=sa.text("is_active = false"),
+    )
+    op.create_table(
+        "users_archive",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("surname", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("last_login_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("deactivated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    # archived users go back, their emails are still claimed by them
+    op.execute(
+        "INSERT INTO users (user_id, name, surname, email, is_active, "
+        "hashed_password, last_login_at) "
+        "SELECT user_id, name, surname, email, is_active, hashed_password, "
+        "last_login_at FROM users_archive"
+    )
+    op.drop_table("users_archive")
+    op.drop_index("ix_users_deactivated_at", table_name="users")
+    op.drop_column("users", "deactivated_at")
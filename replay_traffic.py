@@ -0,0 +1,172 @@
+"""Replays captured traffic against the app and compares the latency
+
+Requests recorded by TrafficCaptureMiddleware are re-issued with their
+original spacing divided by --speed. Redacted passwords are replaced by
+--password and authorized requests carry the --token bearer token. Ids of
+users that don't exist on the target make their requests 404, so replay
+against a database restored from the same point as the capture, or compare
+routes that don't depend on ids.
+
+    python replay_traffic.py captures/traffic.ndjson \
+        --base-url http://0.0.0.0:8000 --speed 2 --token "$TOKEN"
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Union
+
+import httpx
+
+from api.middlewares.traffic_capture import REDACTED
+
+###############################
+# BLOCK FOR REPLAY OF TRAFFIC #
+###############################
+
+
+class ReplayResult(NamedTuple):
+    route: str
+    captured_status: int
+    captured_ms: float
+    status: int
+    duration_ms: float
+    lag_ms: float  # how late the request was sent compared to the schedule
+
+
+def read_capture(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as capture:
+        entries = [json.loads(line) for line in capture if line.strip()]
+    return sorted(entries, key=lambda entry: entry["ts"])
+
+
+def _restore(value: Any, password: str) -> Any:
+    if value == REDACTED:
+        return password
+    if isinstance(value, dict):
+        return {name: _restore(item, password) for name, item in value.items()}
+    return value
+
+
+def _request_options(entry: Dict, password: str, token: Union[str, None]) -> Dict:
+    headers = dict(entry["headers"])
+    if entry["authorized"] and token:
+        headers["Authorization"] = f"Bearer {token}"
+    options = {"params": entry["query"], "headers": headers}
+    body = _restore(entry["body"], password)
+    if body is not None:
+        if headers.get("content-type", "").startswith("application/json"):
+            options["json"] = body
+        else:
+            options["data"] = body
+    return options
+
+
+async def replay(
+    entries: Iterable[Dict],
+    client: httpx.AsyncClient,
+    speed: float = 1.0,
+    password: str = "ReplayPass1!",
+    token: Union[str, None] = None,
+    concurrency: int = 100,
+) -> List[ReplayResult]:
+    entries = list(entries)
+    if not entries:
+        return []
+    slots = asyncio.Semaphore(concurrency)
+    first_ts = entries[0]["ts"]
+    started_at = time.perf_counter()
+
+    async def send(entry: Dict, scheduled_at: float) -> ReplayResult:
+        async with slots:
+            lag = time.perf_counter() - scheduled_at
+            sent_at = time.perf_counter()
+            resp = await client.request(
+                entry["method"],
+                entry["path"],
+                **_request_options(entry, password, token),
+            )
+            duration = time.perf_counter() - sent_at
+        return ReplayResult(
+            route=f"{entry['method']} {entry['path']}",
+            captured_status=entry["status"],
+            captured_ms=entry["duration_ms"],
+            status=resp.status_code,
+            duration_ms=duration * 1000,
+            lag_ms=lag * 1000,
+        )
+
+    tasks = []
+    for entry in entries:
+        scheduled_at = started_at + (entry["ts"] - first_ts) / speed
+        await asyncio.sleep(max(scheduled_at - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(send(entry, scheduled_at)))
+    return await asyncio.gather(*tasks)
+
+
+def _percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def report(results: List[ReplayResult]) -> str:
+    """Latency percentiles per route, captured against replayed"""
+    by_route: Dict[str, List[ReplayResult]] = defaultdict(list)
+    for result in results:
+        by_route[result.route].append(result)
+    lines = [
+        f"{'route':<40} {'n':>6} {'p50 was':>9} {'p50 now':>9} {'p95 was':>9} "
+        f"{'p95 now':>9} {'delta':>8} {'status':>7}"
+    ]
+    for route, route_results in sorted(by_route.items()):
+        captured = [result.captured_ms for result in route_results]
+        replayed = [result.duration_ms for result in route_results]
+        was, now = _percentile(captured, 0.5), _percentile(replayed, 0.5)
+        delta = (now - was) / was * 100 if was else 0.0
+        mismatches = sum(
+            result.status != result.captured_status for result in route_results
+        )
+        lines.append(
+            f"{route:<40} {len(route_results):>6} {was:>9.1f} {now:>9.1f} "
+            f"{_percentile(captured, 0.95):>9.1f} {_percentile(replayed, 0.95):>9.1f} "
+            f"{delta:>+7.0f}% {mismatches:>7}"
+        )
+    lag = max(result.lag_ms for result in results)
+    lines.append(f"max lag behind schedule: {lag:.1f} ms")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="NDJSON written by the traffic capture")
+    parser.add_argument("--base-url", default="http://0.0.0.0:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 is real time")
+    parser.add_argument("--password", default="ReplayPass1!")
+    parser.add_argument("--token", help="bearer token of authorized requests")
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    async def run() -> List[ReplayResult]:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits) as client:
+            return await replay(
+                read_capture(args.capture),
+                client,
+                speed=args.speed,
+                password=args.password,
+                token=args.token,
+                concurrency=args.concurrency,
+            )
+
+    results = asyncio.run(run())
+    print(report(results) if results else "Nothing to replay.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,66 @@
 from datetime import datetime
 from datetime import timedelta
+from functools import lru_cache
+from typing import Dict
+from typing import NamedTuple
 from typing import Optional
 
+from jose import jwk
 from jose import jwt
+from jose import JWTError
 
 import settings
 
+# algorithms signing with a private key, their public keys are published as JWKS
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+
+class SigningKeys(NamedTuple):
+    private_key: str
+    key_id: str
+    public_keys: Dict[str, dict]  # JWK of current and retired keys by kid
+
+
+def is_asymmetric() -> bool:
+    return not settings.ALGORITHM.startswith("HS")
+
+
+def _public_jwk(pem: str, key_id: str) -> dict:
+    key = jwk.construct(pem, settings.ALGORITHM)
+    if not key.is_public():
+        key = key.public_key()
+    return {**key.to_dict(), "kid": key_id, "use": "sig"}
+
+
+def _read(path: str) -> str:
+    with open(path) as key_file:
+        return key_file.read()
+
+
+@lru_cache(maxsize=None)
+def get_signing_keys() -> SigningKeys:
+    """Loads the current private key and the public keys of retired ones"""
+    if settings.ALGORITHM not in ASYMMETRIC_ALGORITHMS:
+        # python-jose has no EdDSA implementation
+        raise ValueError(
+            f"Algorithm {settings.ALGORITHM} is not supported, "
+            f"use HS256 or one of {', '.join(ASYMMETRIC_ALGORITHMS)}."
+        )
+    private_key = _read(settings.JWT_PRIVATE_KEY_FILE)
+    public_keys = {settings.JWT_KEY_ID: _public_jwk(private_key, settings.JWT_KEY_ID)}
+    for item in settings.JWT_RETIRED_PUBLIC_KEY_FILES.split(","):
+        if item.strip():
+            key_id, _, path = item.partition("=")
+            public_keys[key_id.strip()] = _public_jwk(_read(path.strip()), key_id)
+    return SigningKeys(private_key, settings.JWT_KEY_ID, public_keys)
+
+
+def get_jwks() -> dict:
+    """Public keys for local verification of tokens, empty for HMAC algorithms"""
+    if not is_asymmetric():
+        return {"keys": []}
+    return {"keys": list(get_signing_keys().public_keys.values())}
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -16,7 +71,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode.update({"exp": expire})
+    if is_asymmetric():
+        signing_keys = get_signing_keys()
+        return jwt.encode(
+            to_encode,
+            signing_keys.private_key,
+            algorithm=settings.ALGORITHM,
+            headers={"kid": signing_keys.key_id},
+        )
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """Verifies the token with the key named by its kid, raises JWTError"""
+    if not is_asymmetric():
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    key = get_signing_keys().public_keys.get(
+        jwt.get_unverified_header(token).get("kid")
+    )
+    if key is None:
+        raise JWTError("Token is signed with an unknown key.")
+    return jwt.decode(token, key, algorithms=[settings.ALGORITHM])
@@ -0,0 +1,58 @@
+import os
+from typing import Tuple
+
+import uvicorn
+
+import settings
+
+###########################################
+# BLOCK FOR RUNNING THE APP IN PRODUCTION #
+###########################################
+
+
+def get_workers_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def get_pool_sizing(workers: int) -> Tuple[int, int]:
+    """Splits the connection budget between workers, returns pool size and overflow
+
+    Every worker also holds one LISTEN connection for the change feed.
+    """
+    connections_per_worker = settings.DB_MAX_CONNECTIONS // workers - 1
+    if connections_per_worker < 1:
+        raise ValueError(
+            f"DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS} "
+            f"is too low for {workers} workers."
+        )
+    pool_size = min(settings.DB_POOL_SIZE, connections_per_worker)
+    max_overflow = min(settings.DB_MAX_OVERFLOW, connections_per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def run() -> None:
+    workers = get_workers_count()
+    pool_size, max_overflow = get_pool_sizing(workers)
+    warmup_connections = min(settings.DB_POOL_WARMUP_CONNECTIONS, pool_size)
+    # worker processes read their pool sizing from the environment on import
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+    os.environ["DB_POOL_WARMUP_CONNECTIONS"] = str(warmup_connections)
+    settings.DB_POOL_SIZE = pool_size
+    settings.DB_MAX_OVERFLOW = max_overflow
+    settings.DB_POOL_WARMUP_CONNECTIONS = warmup_connections
+    uvicorn.run(
+        "main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    run()
@@ -16,3 +16,245 @@ TEST_DATABASE_URL = env.str(
 ACCESS_TOKEN_EXPIRE_MINUTES: int = env.int("ACCESS_TOKEN_EXPIRE_MINUTES", default=30)
 SECRET_KEY: str = env.str("SECRET_KEY", default="secret_key")
 ALGORITHM: str = env.str("ALGORITHM", default="HS256")
+
+IDEMPOTENCY_STORE_SIZE: int = env.int(
+    "IDEMPOTENCY_STORE_SIZE", default=10000
+)  # how many responses are kept for replay of retried requests
+
+USER_RESPONSE_CACHE_SIZE: int = env.int(
+    "USER_RESPONSE_CACHE_SIZE", default=10000
+)  # how many serialized GET /user/ responses are kept in memory
+
+USER_CHANGES_BUFFER_SIZE: int = env.int(
+    "USER_CHANGES_BUFFER_SIZE", default=100
+)  # undelivered change events kept per subscriber before it is disconnected
+USER_CHANGES_HISTORY_SIZE: int = env.int(
+    "USER_CHANGES_HISTORY_SIZE", default=1000
+)  # recent change events kept for subscribers resuming with Last-Event-ID
+USER_CHANGES_HEARTBEAT_SECONDS: float = env.float(
+    "USER_CHANGES_HEARTBEAT_SECONDS", default=15
+)  # interval of keep-alive comments on an idle change feed stream
+
+DB_POOL_SIZE: int = env.int("DB_POOL_SIZE", default=5)  # connections kept in pool
+DB_MAX_OVERFLOW: int = env.int(
+    "DB_MAX_OVERFLOW", default=10
+)  # connections opened above the pool size under load
+DB_POOL_WARMUP_CONNECTIONS: int = env.int(
+    "DB_POOL_WARMUP_CONNECTIONS", default=5
+)  # connections opened and warmed up before the app reports readiness
+
+SERVER_HOST: str = env.str("SERVER_HOST", default="0.0.0.0")
+SERVER_PORT: int = env.int("SERVER_PORT", default=8000)
+SERVER_WORKERS: int = env.int(
+    "SERVER_WORKERS", default=0
+)  # worker processes, 0 means one per cpu core
+SERVER_LOOP: str = env.str(
+    "SERVER_LOOP", default="auto"
+)  # auto picks uvloop when it is installed
+SERVER_HTTP: str = env.str(
+    "SERVER_HTTP", default="auto"
+)  # auto picks httptools when it is installed
+SERVER_BACKLOG: int = env.int("SERVER_BACKLOG", default=2048)
+SERVER_KEEP_ALIVE_SECONDS: int = env.int("SERVER_KEEP_ALIVE_SECONDS", default=5)
+SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = env.int(
+    "SERVER_GRACEFUL_SHUTDOWN_SECONDS", default=30
+)  # time given to in-flight requests to finish on shutdown
+DB_MAX_CONNECTIONS: int = env.int(
+    "DB_MAX_CONNECTIONS", default=100
+)  # connections to the database allowed for all workers together
+
+LAST_LOGIN_BUFFER_SIZE: int = env.int(
+    "LAST_LOGIN_BUFFER_SIZE", default=10000
+)  # users with an unsaved login time kept in memory
+LAST_LOGIN_FLUSH_SECONDS: float = env.float(
+    "LAST_LOGIN_FLUSH_SECONDS", default=5
+)  # interval of saving the buffered login times
+
+PROFILING_ENABLED: bool = env.bool(
+    "PROFILING_ENABLED", default=False
+)  # installs the per-request profiling middleware
+PROFILING_HEADER: str = env.str(
+    "PROFILING_HEADER", default="X-Profile"
+)  # header requesting the profile of a request, its value must be the token
+PROFILING_TOKEN: str = env.str("PROFILING_TOKEN", default="")
+PROFILING_SAMPLE_RATE: float = env.float(
+    "PROFILING_SAMPLE_RATE", default=0.0
+)  # share of requests profiled without the header
+PROFILING_DIR: str = env.str("PROFILING_DIR", default="/tmp/oxford-profiles")
+PROFILING_MAX_FILES: int = env.int(
+    "PROFILING_MAX_FILES", default=100
+)  # profiles kept in the directory, the oldest are removed
+
+DIAGNOSTICS_ENABLED: bool = env.bool(
+    "DIAGNOSTICS_ENABLED", default=False
+)  # mounts the memory diagnostics endpoints
+DIAGNOSTICS_HEADER: str = env.str(
+    "DIAGNOSTICS_HEADER", default="X-Diagnostics-Token"
+)  # header carrying the token of the diagnostics endpoints
+DIAGNOSTICS_TOKEN: str = env.str("DIAGNOSTICS_TOKEN", default="")
+DIAGNOSTICS_MAX_SNAPSHOTS: int = env.int(
+    "DIAGNOSTICS_MAX_SNAPSHOTS", default=5
+)  # tracemalloc snapshots kept for diffing, the oldest are dropped
+
+LOOP_MONITOR_ENABLED: bool = env.bool(
+    "LOOP_MONITOR_ENABLED", default=True
+)  # measures the lag of the event loop and logs what blocks it
+LOOP_MONITOR_INTERVAL_SECONDS: float = env.float(
+    "LOOP_MONITOR_INTERVAL_SECONDS", default=0.25
+)  # interval of the lag probes
+LOOP_MONITOR_THRESHOLD_SECONDS: float = env.float(
+    "LOOP_MONITOR_THRESHOLD_SECONDS", default=0.1
+)  # lag at which the stack of the blocking code is logged
+
+SERVER_TIMING_ENABLED: bool = env.bool(
+    "SERVER_TIMING_ENABLED", default=False
+)  # adds the Server-Timing header with request phases to responses
+
+LOG_LEVEL: str = env.str("LOG_LEVEL", default="INFO")  # level of the root logger
+LOG_LEVELS: str = env.str(
+    "LOG_LEVELS", default=""
+)  # per logger levels, e.g. "sqlalchemy.engine=INFO,api=DEBUG"
+LOG_SAMPLING: str = env.str(
+    "LOG_SAMPLING", default=""
+)  # share of records kept per logger, e.g. "sqlalchemy.engine=0.01"
+LOG_QUEUE_SIZE: int = env.int(
+    "LOG_QUEUE_SIZE", default=10000
+)  # records waiting to be written, new ones are dropped when it is full
+
+USER_REPOSITORY: str = env.str(
+    "USER_REPOSITORY", default="postgres"
+)  # storage of users: "postgres", or "memory" to benchmark without database
+
+USER_STATS_RECONCILE_SECONDS: float = env.float(
+    "USER_STATS_RECONCILE_SECONDS", default=3600
+)  # interval of recounting users to correct drift of the counters
+
+ADMISSION_CONTROL_ENABLED: bool = env.bool(
+    "ADMISSION_CONTROL_ENABLED", default=True
+)  # shed load with 503 instead of letting requests pile up
+ADMISSION_DEFAULT_CONCURRENCY: int = env.int(
+    "ADMISSION_DEFAULT_CONCURRENCY", default=32
+)  # cheap requests running at once in a worker
+ADMISSION_DEFAULT_QUEUE: int = env.int(
+    "ADMISSION_DEFAULT_QUEUE", default=128
+)  # cheap requests waiting for admission in a worker
+ADMISSION_EXPENSIVE_CONCURRENCY: int = env.int(
+    "ADMISSION_EXPENSIVE_CONCURRENCY", default=4
+)  # logins and signups, which hash passwords, running at once in a worker
+ADMISSION_EXPENSIVE_QUEUE: int = env.int(
+    "ADMISSION_EXPENSIVE_QUEUE", default=16
+)  # logins and signups waiting for admission in a worker
+ADMISSION_TARGET_WAIT_SECONDS: float = env.float(
+    "ADMISSION_TARGET_WAIT_SECONDS", default=0.1
+)  # requests are shed early while the recent queue or pool wait is above it
+ADMISSION_MAX_WAIT_SECONDS: float = env.float(
+    "ADMISSION_MAX_WAIT_SECONDS", default=1
+)  # requests waiting longer for admission are shed
+ADMISSION_RETRY_AFTER_SECONDS: int = env.int(
+    "ADMISSION_RETRY_AFTER_SECONDS", default=1
+)  # Retry-After of the shed requests
+
+REQUEST_TIMEOUT_SECONDS: float = env.float(
+    "REQUEST_TIMEOUT_SECONDS", default=10
+)  # deadline of requests without a route default or a timeout header
+REQUEST_TIMEOUT_MAX_SECONDS: float = env.float(
+    "REQUEST_TIMEOUT_MAX_SECONDS", default=60
+)  # upper bound of the timeout a client can ask for
+REQUEST_TIMEOUTS: str = env.str(
+    "REQUEST_TIMEOUTS", default="GET /user/=2,GET /user/stats=2"
+)  # per route defaults, e.g. "POST /user/=5,GET /user/=2"
+REQUEST_TIMEOUT_HEADER: str = env.str(
+    "REQUEST_TIMEOUT_HEADER", default="X-Request-Timeout"
+)  # header with the timeout in seconds the client is willing to wait
+
+EMAIL_FILTER_CAPACITY: int = env.int(
+    "EMAIL_FILTER_CAPACITY", default=1000000
+)  # taken emails the availability filter is sized for
+EMAIL_FILTER_ERROR_RATE: float = env.float(
+    "EMAIL_FILTER_ERROR_RATE", default=0.01
+)  # share of free emails that still need a database lookup at full capacity
+
+TRAFFIC_CAPTURE_ENABLED: bool = env.bool(
+    "TRAFFIC_CAPTURE_ENABLED", default=False
+)  # record sampled requests for a replay with replay_traffic.py
+TRAFFIC_CAPTURE_PATH: str = env.str(
+    "TRAFFIC_CAPTURE_PATH", default="captures/traffic.ndjson"
+)  # NDJSON file the captured requests are appended to
+TRAFFIC_CAPTURE_SAMPLE_RATE: float = env.float(
+    "TRAFFIC_CAPTURE_SAMPLE_RATE", default=0.01
+)  # share of requests captured
+TRAFFIC_CAPTURE_MAX_BODY_BYTES: int = env.int(
+    "TRAFFIC_CAPTURE_MAX_BODY_BYTES", default=65536
+)  # larger request bodies are not captured
+TRAFFIC_CAPTURE_QUEUE_SIZE: int = env.int(
+    "TRAFFIC_CAPTURE_QUEUE_SIZE", default=10000
+)  # captured requests waiting to be written, more are dropped
+
+JOB_WORKERS: int = env.int(
+    "JOB_WORKERS", default=2
+)  # jobs run at once in a server worker
+JOB_POLL_SECONDS: float = env.float(
+    "JOB_POLL_SECONDS", default=5
+)  # interval of looking for jobs submitted through other workers
+JOB_LEASE_SECONDS: float = env.float(
+    "JOB_LEASE_SECONDS", default=300
+)  # a running job without progress for this long is taken over by another worker
+JOB_RETRY_DELAY_SECONDS: float = env.float(
+    "JOB_RETRY_DELAY_SECONDS", default=10
+)  # delay of the first retry of a failed job, doubled for each next one
+JOB_MAX_ATTEMPTS: int = env.int(
+    "JOB_MAX_ATTEMPTS", default=3
+)  # attempts of a job before it fails for good
+JOB_CHUNK_SIZE: int = env.int(
+    "JOB_CHUNK_SIZE", default=1000
+)  # users changed by a job in one transaction
+JOB_MAX_USER_IDS: int = env.int(
+    "JOB_MAX_USER_IDS", default=1000000
+)  # users a single job can be submitted for
+
+USER_CREATE_COALESCING_ENABLED: bool = env.bool(
+    "USER_CREATE_COALESCING_ENABLED", default=False
+)  # creates of concurrent requests share one insert and commit
+USER_CREATE_COALESCE_WINDOW_SECONDS: float = env.float(
+    "USER_CREATE_COALESCE_WINDOW_SECONDS", default=0.005
+)  # how long the first create waits for others, the added latency at most
+USER_CREATE_COALESCE_MAX_BATCH: int = env.int(
+    "USER_CREATE_COALESCE_MAX_BATCH", default=100
+)  # creates that are flushed at once without waiting for the window
+
+BATCH_MAX_OPERATIONS: int = env.int(
+    "BATCH_MAX_OPERATIONS", default=100
+)  # operations accepted by one batch request
+BATCH_MAX_COST: int = env.int(
+    "BATCH_MAX_COST", default=100
+)  # cost of the operations of one batch, a create costs the most as it hashes
+
+USER_ARCHIVE_RETENTION_DAYS: float = env.float(
+    "USER_ARCHIVE_RETENTION_DAYS", default=30
+)  # deactivated users are moved to the archive after it
+USER_ARCHIVE_INTERVAL_SECONDS: float = env.float(
+    "USER_ARCHIVE_INTERVAL_SECONDS", default=3600
+)  # interval of looking for users due for the archive
+USER_ARCHIVE_BATCH_SIZE: int = env.int(
+    "USER_ARCHIVE_BATCH_SIZE", default=1000
+)  # users moved to the archive in one transaction
+USER_ARCHIVE_BATCH_PAUSE_SECONDS: float = env.float(
+    "USER_ARCHIVE_BATCH_PAUSE_SECONDS", default=0.1
+)  # pause between the batches of the archival
+
+INTROSPECTION_MAX_TOKENS: int = env.int(
+    "INTROSPECTION_MAX_TOKENS", default=100
+)  # tokens accepted by one introspection request
+
+# keys for the asymmetric ALGORITHM values (RS256, ES256, ...), to rotate keys
+# move the current key to the retired ones and start signing with a new key id
+JWT_PRIVATE_KEY_FILE: str = env.str(
+    "JWT_PRIVATE_KEY_FILE", default=""
+)  # PEM file of the key signing new tokens
+JWT_KEY_ID: str = env.str("JWT_KEY_ID", default="default")  # kid of the signing key
+JWT_RETIRED_PUBLIC_KEY_FILES: str = env.str(
+    "JWT_RETIRED_PUBLIC_KEY_FILES", default=""
+)  # "kid=path,..." of PEM keys still accepted until their tokens expire
+JWKS_MAX_AGE_SECONDS: int = env.int(
+    "JWKS_MAX_AGE_SECONDS", default=3600
+)  # how long clients may cache the published keys
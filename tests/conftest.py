@@ -17,6 +17,9 @@ from sqlalchemy.orm import sessionmaker
 from starlette.testclient import TestClient
 
 import settings
+from api.cache import user_response_cache
+from api.email_filter import email_availability
+from api.idempotency import idempotency_store
 from db.session import get_db
 from hashing import Hasher
 from main import app
@@ -24,6 +27,10 @@ from security import create_access_token
 
 CLEAN_TABLES = [
     "users",
+    "user_emails",
+    "user_stats_counters",
+    "jobs",
+    "users_archive",
 ]
 
 
@@ -81,6 +88,9 @@ async def clean_tables(async_session_test):
     async with async_session_test() as session, session.begin():
         for table_for_cleaning in CLEAN_TABLES:
             await session.execute(text(f"""TRUNCATE TABLE {table_for_cleaning};"""))
+    user_response_cache.clear()
+    email_availability.reset()
+    idempotency_store.clear()
 
 
 async def _get_test_db():
@@ -0,0 +1,81 @@
+import asyncio
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from api.middlewares.admission import AdmissionBudget
+from api.middlewares.admission import AdmissionControlMiddleware
+
+
+def make_budget(name: str = "default", **kwargs) -> AdmissionBudget:
+    options = dict(max_concurrency=1, max_queue=1, target_wait=0.1, max_wait=1)
+    options.update(kwargs)
+    return AdmissionBudget(name, **options)
+
+
+async def test_budget_queues_and_sheds():
+    budget = make_budget()
+    assert await budget.acquire()
+    waiting = asyncio.create_task(budget.acquire())
+    await asyncio.sleep(0)
+    # the queue is full, so the next request is shed at once
+    assert not await budget.acquire()
+    budget.release()
+    assert await waiting
+    assert budget.in_flight == 1
+    budget.release()
+    assert budget.in_flight == 0
+
+
+async def test_budget_sheds_after_max_wait():
+    budget = make_budget(target_wait=0.001, max_wait=0.05)
+    assert await budget.acquire()
+    assert not await budget.acquire()
+    # the recent queue wait is above the target, so nothing is queued now
+    assert budget.overloaded()
+    budget.release()
+    assert await budget.acquire()
+
+
+async def test_budget_sheds_on_pool_wait():
+    budget = make_budget(pool_wait=lambda: 1.0)
+    assert await budget.acquire()
+    assert not await budget.acquire()
+
+
+def make_app(default: AdmissionBudget) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "pong"}
+
+    @app.get("/health/live")
+    async def live():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        default=default,
+        expensive=make_budget("expensive"),
+        expensive_routes=[("POST", "/login/token")],
+        exempt=["/health"],
+        retry_after=3,
+    )
+    return app
+
+
+def test_middleware_sheds_with_retry_after():
+    client = TestClient(make_app(make_budget(max_concurrency=0, max_queue=0)))
+    resp = client.get("/ping")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "3"
+    assert client.get("/health/live").status_code == 200
+
+
+def test_middleware_releases_slots():
+    default = make_budget()
+    client = TestClient(make_app(default))
+    for _ in range(3):
+        assert client.get("/ping").json() == {"status": "pong"}
+    assert default.in_flight == 0
@@ -0,0 +1,82 @@
+import asyncio
+import json
+from uuid import uuid4
+
+from starlette.testclient import TestClient
+
+from api.change_feed import UserChangeFeed
+from db.dals import USER_CHANGES_CHANNEL
+
+
+def make_payload(operation: str = "update") -> str:
+    return json.dumps({"operation": operation, "user_id": str(uuid4())})
+
+
+async def test_change_feed_fans_out_events():
+    feed = UserChangeFeed(dsn="", buffer_size=10, history_size=10)
+    first_subscriber = feed.attach()
+    second_subscriber = feed.attach()
+    payload = make_payload("create")
+    feed.dispatch(payload)
+    for subscriber in (first_subscriber, second_subscriber):
+        event = subscriber.queue.get_nowait()
+        assert event.event_id == f"{feed.epoch}-1"
+        assert event.name == "create"
+        assert event.data == payload
+
+
+async def test_change_feed_resumes_from_last_event_id():
+    feed = UserChangeFeed(dsn="", buffer_size=10, history_size=10)
+    payloads = [make_payload() for _ in range(3)]
+    for payload in payloads:
+        feed.dispatch(payload)
+    subscriber = feed.attach(last_event_id=f"{feed.epoch}-1")
+    assert subscriber.queue.get_nowait().data == payloads[1]
+    assert subscriber.queue.get_nowait().data == payloads[2]
+    assert subscriber.queue.empty()
+
+
+async def test_change_feed_resets_unknown_event_id():
+    feed = UserChangeFeed(dsn="", buffer_size=10, history_size=2)
+    for _ in range(5):
+        feed.dispatch(make_payload())
+    subscriber = feed.attach(last_event_id=f"{feed.epoch}-1")
+    assert subscriber.queue.get_nowait().name == "reset"
+    subscriber = feed.attach(last_event_id="otherepoch-4")
+    assert subscriber.queue.get_nowait().name == "reset"
+
+
+async def test_change_feed_disconnects_slow_subscriber():
+    feed = UserChangeFeed(dsn="", buffer_size=2, history_size=10)
+    subscriber = feed.attach()
+    for _ in range(3):
+        feed.dispatch(make_payload())
+    assert subscriber.queue.get_nowait() is None
+    feed.dispatch(make_payload())
+    assert subscriber.queue.empty()
+
+
+async def test_user_creation_notifies_listeners(client: TestClient, asyncpg_pool):
+    notifications = asyncio.Queue()
+
+    def on_notification(connection, pid, channel, payload):
+        notifications.put_nowait(payload)
+
+    async with asyncpg_pool.acquire() as connection:
+        await connection.add_listener(USER_CHANGES_CHANNEL, on_notification)
+        resp = client.post(
+            "/user/",
+            json={
+                "name": "Boba",
+                "surname": "Bobenko",
+                "email": "boba@boba.com",
+                "password": "SamplePass1!",
+            },
+        )
+        payload = json.loads(await asyncio.wait_for(notifications.get(), 5))
+        await connection.remove_listener(USER_CHANGES_CHANNEL, on_notification)
+    assert payload == {
+        "operation": "create",
+        "user_id": resp.json()["user_id"],
+        "email": "boba@boba.com",
+    }
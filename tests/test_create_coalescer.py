@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from fastapi import status
+from starlette.testclient import TestClient
+
+import settings
+from db.create_coalescer import coalesced_batch_size
+from db.create_coalescer import user_create_coalescer
+from db.create_coalescer import UserCreateCoalescer
+from tests.conftest import create_sample_user
+
+
+def make_coalescer(async_session_test, window=0.05, max_batch=100):
+    return UserCreateCoalescer(
+        window=window,
+        max_batch=max_batch,
+        session_factory=lambda: async_session_test,
+    )
+
+
+def flushes() -> int:
+    return sum(totals[0] for _, totals in coalesced_batch_size.values.values())
+
+
+async def test_concurrent_creates_share_a_transaction(
+    async_session_test, create_user_in_database, get_user_from_database
+):
+    user_data = await create_sample_user(create_user_in_database)
+    coalescer = make_coalescer(async_session_test)
+    flushes_before = flushes()
+    emails = ["a@kek.com", "b@kek.com", "a@kek.com", user_data.email, "c@kek.com"]
+
+    users = await asyncio.gather(
+        *(coalescer.create_user("Ivan", "Ivanov", email, "hash") for email in emails)
+    )
+
+    assert flushes() == flushes_before + 1
+    # the first create of an email wins, taken emails get None like create_user
+    assert [user and user.email for user in users] == [
+        "a@kek.com",
+        "b@kek.com",
+        None,
+        None,
+        "c@kek.com",
+    ]
+    for user in users:
+        if user is not None:
+            assert len(await get_user_from_database(user.user_id)) == 1
+
+
+async def test_full_batch_is_flushed_before_the_window(async_session_test):
+    coalescer = make_coalescer(async_session_test, window=10, max_batch=2)
+    started_at = time.perf_counter()
+    users = await asyncio.gather(
+        coalescer.create_user("Ivan", "Ivanov", "a@kek.com", "hash"),
+        coalescer.create_user("Ivan", "Ivanov", "b@kek.com", "hash"),
+    )
+    assert time.perf_counter() - started_at < 5
+    assert all(users)
+
+
+async def test_create_user_handler_coalesced(
+    client: TestClient, async_session_test, get_user_from_database, monkeypatch
+):
+    monkeypatch.setattr(settings, "USER_CREATE_COALESCING_ENABLED", True)
+    monkeypatch.setattr(
+        user_create_coalescer, "session_factory", lambda: async_session_test
+    )
+    user_data = {
+        "name": "Nikolai",
+        "surname": "Sviridov",
+        "email": "lol@kek.com",
+        "password": "SamplePass1!",
+    }
+    resp = client.post("/user/", json=user_data)
+    assert resp.status_code == status.HTTP_200_OK
+    [user_from_db] = await get_user_from_database(resp.json()["user_id"])
+    assert user_from_db["email"] == user_data["email"]
+    resp = client.post("/user/", json=user_data)
+    assert resp.status_code == status.HTTP_409_CONFLICT
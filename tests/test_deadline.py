@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from starlette.testclient import TestClient
+
+from api.middlewares.deadline import _timeout_reason
+from api.middlewares.deadline import DeadlineMiddleware
+from deadlines import deadline_after
+from deadlines import remaining_time
+from deadlines import timed_out_requests
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sleep")
+    async def sleep(seconds: float):
+        await asyncio.sleep(seconds)
+        return {"remaining": remaining_time()}
+
+    app.add_middleware(
+        DeadlineMiddleware,
+        default_timeout=1,
+        max_timeout=5,
+        route_timeouts={"GET /sleep": 0.5},
+        header="X-Request-Timeout",
+        exempt=["/health"],
+    )
+    return app
+
+
+def test_request_within_deadline():
+    resp = TestClient(make_app()).get("/sleep?seconds=0")
+    assert resp.status_code == 200
+    # the route default applies when the header is missing
+    assert 0 < resp.json()["remaining"] <= 0.5
+
+
+def test_request_past_deadline():
+    timed_out = timed_out_requests.get(reason="deadline")
+    resp = TestClient(make_app()).get(
+        "/sleep?seconds=1", headers={"X-Request-Timeout": "0.05"}
+    )
+    assert resp.status_code == 504
+    assert resp.json() == {"detail": "Request deadline exceeded."}
+    assert timed_out_requests.get(reason="deadline") == timed_out + 1
+
+
+async def test_deadline_sets_statement_timeout(async_session_test):
+    async with async_session_test() as session:
+        with deadline_after(0.1):
+            with pytest.raises(DBAPIError) as err:
+                async with session.begin():
+                    await session.execute(text("SELECT pg_sleep(2)"))
+    assert _timeout_reason(err.value) == "statement"
@@ -0,0 +1,104 @@
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+import settings
+from api.diagnostics import memory_diagnostics
+from api.diagnostics_handler import diagnostics_router
+
+HEADERS = {"X-Diagnostics-Token": "secret"}
+
+# kept alive between the snapshots, so the diff has a site that grew
+leaked = []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "DIAGNOSTICS_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(diagnostics_router, prefix="/diagnostics")
+    yield TestClient(app)
+    memory_diagnostics.stop()
+    leaked.clear()
+
+
+def test_diagnostics_require_token(client: TestClient):
+    assert client.get("/diagnostics/memory").status_code == 403
+    resp = client.get("/diagnostics/memory", headers={"X-Diagnostics-Token": "guess"})
+    assert resp.status_code == 403
+
+
+def test_diagnostics_closed_without_configured_token(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "DIAGNOSTICS_TOKEN", "")
+    resp = client.get("/diagnostics/memory", headers={"X-Diagnostics-Token": ""})
+    assert resp.status_code == 403
+
+
+def test_memory_snapshots_diff(client: TestClient):
+    resp = client.post("/diagnostics/memory/snapshots", headers=HEADERS)
+    assert resp.status_code == 409
+
+    resp = client.post("/diagnostics/memory/start", headers=HEADERS)
+    assert resp.json()["tracing"] is True
+    assert tracemalloc.is_tracing()
+    base_id = client.post("/diagnostics/memory/snapshots", headers=HEADERS).json()[
+        "snapshot_id"
+    ]
+    leaked.extend(bytearray(1024) for _ in range(1000))
+    resp = client.post("/diagnostics/memory/snapshots", headers=HEADERS)
+    assert resp.status_code == 200
+    snapshot_id = resp.json()["snapshot_id"]
+    assert resp.json()["top"]
+
+    resp = client.get(
+        f"/diagnostics/memory/diff?base_id={base_id}&snapshot_id={snapshot_id}&top=5",
+        headers=HEADERS,
+    )
+    assert resp.status_code == 200
+    [grown, *_] = resp.json()["top"]
+    assert grown["file"] == __file__
+    assert grown["size_diff"] >= 1024 * 1000
+
+    resp = client.get(
+        f"/diagnostics/memory/diff?base_id=999&snapshot_id={snapshot_id}",
+        headers=HEADERS,
+    )
+    assert resp.status_code == 404
+    assert resp.json() == {"detail": "Snapshot with id 999 not found."}
+
+    resp = client.post("/diagnostics/memory/stop", headers=HEADERS)
+    assert resp.json() == {"tracing": False, "frames": 1, "snapshot_ids": []}
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_snapshots_are_bounded(client: TestClient, monkeypatch):
+    monkeypatch.setattr(memory_diagnostics, "max_snapshots", 2)
+    client.post("/diagnostics/memory/start?frames=3", headers=HEADERS)
+    snapshot_ids = [
+        client.post("/diagnostics/memory/snapshots", headers=HEADERS).json()[
+            "snapshot_id"
+        ]
+        for _ in range(3)
+    ]
+    resp = client.get("/diagnostics/memory", headers=HEADERS)
+    assert resp.json()["frames"] == 3
+    assert resp.json()["snapshot_ids"] == snapshot_ids[1:]
+    resp = client.get(
+        f"/diagnostics/memory/snapshots/{snapshot_ids[0]}", headers=HEADERS
+    )
+    assert resp.status_code == 404
+    resp = client.get(
+        f"/diagnostics/memory/snapshots/{snapshot_ids[2]}?top=3", headers=HEADERS
+    )
+    assert len(resp.json()["top"]) == 3
+    assert resp.json()["top"][0]["traceback"]
+
+
+def test_gc_stats(client: TestClient):
+    resp = client.get("/diagnostics/gc?top=5", headers=HEADERS)
+    assert resp.status_code == 200
+    assert len(resp.json()["generations"]) == 3
+    assert len(resp.json()["objects_by_type"]) == 5
+    assert resp.json()["max_rss"] > 0
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from fastapi import status
+from starlette.testclient import TestClient
+
+from db.archiver import UserArchiver
+from tests.conftest import create_sample_user
+from tests.conftest import create_test_auth_headers_for_user
+
+
+def _archiver(async_session_test, retention=timedelta(0), batch_size=100):
+    return UserArchiver(
+        interval=60,
+        retention=retention,
+        batch_size=batch_size,
+        batch_pause=0,
+        session_factory=lambda: async_session_test,
+    )
+
+
+def _create_users(client: TestClient, count: int):
+    user_ids = []
+    for number in range(count):
+        resp = client.post(
+            "/user/",
+            json={
+                "name": "Nikolai",
+                "surname": "Sviridov",
+                "email": f"archived{number}@kek.com",
+                "password": "SamplePass1!",
+            },
+        )
+        assert resp.status_code == status.HTTP_200_OK
+        user_ids.append(resp.json()["user_id"])
+    return user_ids
+
+
+async def test_archive_inactive_users(
+    client: TestClient,
+    create_user_in_database,
+    get_user_from_database,
+    async_session_test,
+):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    user_ids = _create_users(client, 3)
+    for user_id in user_ids:
+        resp = client.delete(f"/user/?user_id={user_id}", headers=headers)
+        assert resp.status_code == status.HTTP_200_OK
+
+    # batches smaller than the users due still archive them all
+    assert await _archiver(async_session_test, batch_size=2).archive() == 3
+
+    for user_id in user_ids:
+        assert await get_user_from_database(user_id) == []
+        resp = client.get(f"/user/?user_id={user_id}", headers=headers)
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.json()["user_id"] == user_id
+        assert resp.json()["is_active"] is False
+    # the active user stays in users
+    assert len(await get_user_from_database(user_data.user_id)) == 1
+    # archived users are still counted, the sample user was inserted past the DAL
+    resp = client.get("/user/stats", headers=headers)
+    assert resp.json()["total"] == 3
+
+
+async def test_archive_keeps_users_within_retention(
+    client: TestClient,
+    create_user_in_database,
+    get_user_from_database,
+    async_session_test,
+):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    [user_id] = _create_users(client, 1)
+    client.delete(f"/user/?user_id={user_id}", headers=headers)
+
+    archiver = _archiver(async_session_test, retention=timedelta(days=1))
+    assert await archiver.archive() == 0
+
+    assert len(await get_user_from_database(user_id)) == 1
+
+
+async def test_archived_email_stays_taken(
+    client: TestClient, create_user_in_database, async_session_test
+):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    [user_id] = _create_users(client, 1)
+    client.delete(f"/user/?user_id={user_id}", headers=headers)
+    assert await _archiver(async_session_test).archive() == 1
+
+    resp = client.post(
+        "/user/",
+        json={
+            "name": "Nikolai",
+            "surname": "Sviridov",
+            "email": "archived0@kek.com",
+            "password": "SamplePass1!",
+        },
+    )
+    assert resp.status_code == status.HTTP_409_CONFLICT
@@ -0,0 +1,119 @@
+from uuid import uuid4
+
+from fastapi import status
+from starlette.testclient import TestClient
+
+import settings
+from tests.conftest import create_sample_user
+from tests.conftest import create_test_auth_headers_for_user
+
+NEW_USER = {
+    "name": "Nikolai",
+    "surname": "Sviridov",
+    "email": "lol@kek.com",
+    "password": "SamplePass1!",
+}
+
+
+async def test_batch(
+    client: TestClient, create_user_in_database, get_user_from_database
+):
+    user_data = await create_sample_user(create_user_in_database)
+    user_id = str(user_data.user_id)
+    missing_user_id = str(uuid4())
+    resp = client.post(
+        "/batch/",
+        json={
+            "operations": [
+                {"method": "create", "body": NEW_USER},
+                {"method": "create", "body": NEW_USER},
+                {"method": "update", "user_id": user_id, "body": {"name": "Ivan"}},
+                {"method": "get", "user_id": user_id},
+                {"method": "delete", "user_id": missing_user_id},
+                {"method": "create", "body": {**NEW_USER, "name": "123"}},
+            ]
+        },
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    results = resp.json()["results"]
+    assert [result["status"] for result in results] == [200, 409, 200, 200, 404, 422]
+    created_user_id = results[0]["body"]["user_id"]
+    assert results[0]["body"]["email"] == NEW_USER["email"]
+    assert results[2]["body"] == {"updated_user_id": user_id}
+    # the get sees the update made before it in the batch
+    assert results[3]["body"]["name"] == "Ivan"
+    assert results[4]["body"] == {
+        "detail": f"User with id {missing_user_id} not found."
+    }
+    assert results[5]["body"] == {"detail": "Name should contains only letters."}
+    assert len(await get_user_from_database(created_user_id)) == 1
+    [user_from_db] = await get_user_from_database(user_id)
+    assert user_from_db["name"] == "Ivan"
+
+
+async def test_atomic_batch_is_rolled_back(
+    client: TestClient, create_user_in_database, get_user_from_database
+):
+    user_data = await create_sample_user(create_user_in_database)
+    user_id = str(user_data.user_id)
+    resp = client.post(
+        "/batch/",
+        json={
+            "operations": [
+                {"method": "update", "user_id": user_id, "body": {"name": "Ivan"}},
+                {"method": "delete", "user_id": str(uuid4())},
+                {"method": "delete", "user_id": user_id},
+            ],
+            "atomic": True,
+        },
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    statuses = [result["status"] for result in resp.json()["results"]]
+    assert statuses == [424, 404, 424]
+    [user_from_db] = await get_user_from_database(user_id)
+    assert user_from_db["name"] == user_data.name
+    assert user_from_db["is_active"] is True
+
+
+async def test_batch_over_cost(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    creates = settings.BATCH_MAX_COST // 10 + 1
+    resp = client.post(
+        "/batch/",
+        json={"operations": [{"method": "create", "body": NEW_USER}] * creates},
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+async def test_batch_over_size(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    operation = {"method": "get", "user_id": str(user_data.user_id)}
+    resp = client.post(
+        "/batch/",
+        json={"operations": [operation] * (settings.BATCH_MAX_OPERATIONS + 1)},
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_batch_operation_without_user_id(
+    client: TestClient, create_user_in_database
+):
+    user_data = await create_sample_user(create_user_in_database)
+    resp = client.post(
+        "/batch/",
+        json={"operations": [{"method": "delete"}]},
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json() == {"detail": "user_id should be provided for delete."}
+
+
+async def test_batch_unauthorized(client: TestClient):
+    resp = client.post(
+        "/batch/", json={"operations": [{"method": "create", "body": NEW_USER}]}
+    )
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
@@ -65,11 +65,47 @@ async def test_create_user_duplicate_email_error(
         "password": "SamplePass1!",
     }
     resp = client.post("/user/", data=json.dumps(user_data_same_email))
-    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
-    assert (
-        'duplicate key value violates unique constraint "users_email_key"'
-        in resp.json()["detail"]
-    )
+    assert resp.status_code == status.HTTP_409_CONFLICT
+    assert resp.json() == {"detail": "User with email boba@boba.com already exists."}
+
+
+async def test_create_user_idempotency_key_replay(
+    client: TestClient, get_user_from_database
+):
+    user_data = {
+        "name": "Boba",
+        "surname": "Bobenko",
+        "email": "boba@boba.com",
+        "password": "SamplePass1!",
+    }
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    resp = client.post("/user/", data=json.dumps(user_data), headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+    replayed_resp = client.post("/user/", data=json.dumps(user_data), headers=headers)
+    assert replayed_resp.status_code == status.HTTP_200_OK
+    assert replayed_resp.json() == resp.json()
+    assert replayed_resp.headers["Idempotent-Replayed"] == "true"
+    await verify_user_in_db(get_user_from_database, user_data, resp.json()["user_id"])
+
+
+async def test_create_user_idempotency_key_reused_for_another_body(
+    client: TestClient,
+):
+    user_data = {
+        "name": "Boba",
+        "surname": "Bobenko",
+        "email": "boba@boba.com",
+        "password": "SamplePass1!",
+    }
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    resp = client.post("/user/", data=json.dumps(user_data), headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+    other_user_data = {**user_data, "email": "alice@boba.com"}
+    resp = client.post("/user/", data=json.dumps(other_user_data), headers=headers)
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json() == {
+        "detail": "Idempotency-Key was already used for another request."
+    }
 
 
 @pytest.mark.parametrize(
@@ -0,0 +1,57 @@
+from fastapi import status
+from starlette.testclient import TestClient
+
+from api.email_filter import BloomFilter
+from api.email_filter import email_availability
+from api.email_filter import email_checks
+from tests.conftest import create_sample_user
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    emails = [f"user{i}@example.com" for i in range(1000)]
+    for email in emails:
+        bloom_filter.add(email)
+    assert all(email in bloom_filter for email in emails)
+    false_positives = sum(f"other{i}@example.com" in bloom_filter for i in range(10000))
+    assert false_positives < 300
+
+
+async def test_email_availability(
+    client: TestClient, create_user_in_database, async_session_test
+):
+    user_data = await create_sample_user(create_user_in_database)
+    assert await email_availability.load(lambda: async_session_test)
+
+    resp = client.get(f"/user/email-availability?email={user_data.email}")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"email": user_data.email, "available": False}
+
+    filtered = email_checks.get(outcome="filtered")
+    resp = client.get("/user/email-availability?email=free@kek.com")
+    assert resp.json() == {"email": "free@kek.com", "available": True}
+    # the free email was answered by the filter alone
+    assert email_checks.get(outcome="filtered") == filtered + 1
+
+
+async def test_email_taken_by_create_is_unavailable(
+    client: TestClient, async_session_test
+):
+    assert await email_availability.load(lambda: async_session_test)
+    resp = client.post(
+        "/user/",
+        json={
+            "name": "Nikolai",
+            "surname": "Sviridov",
+            "email": "lol@kek.com",
+            "password": "SamplePass1!",
+        },
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    resp = client.get("/user/email-availability?email=lol@kek.com")
+    assert resp.json() == {"email": "lol@kek.com", "available": False}
+
+
+async def test_email_availability_invalid_email(client: TestClient):
+    resp = client.get("/user/email-availability?email=not-an-email")
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -25,6 +25,41 @@ async def test_get_user_by_id(
     assert users_from_resp["user_id"] == str(user_data.user_id)
 
 
+async def test_get_user_by_id_not_modified(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    resp = client.get(f"/user/?user_id={user_data.user_id}", headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+    etag = resp.headers["ETag"]
+    resp = client.get(
+        f"/user/?user_id={user_data.user_id}",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.headers["ETag"] == etag
+    assert resp.content == b""
+
+
+async def test_get_user_by_id_after_update(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    resp = client.get(f"/user/?user_id={user_data.user_id}", headers=headers)
+    etag = resp.headers["ETag"]
+    resp = client.patch(
+        f"/user/?user_id={user_data.user_id}",
+        json={"name": "Ivan"},
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    resp = client.get(
+        f"/user/?user_id={user_data.user_id}",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["ETag"] != etag
+    assert resp.json()["name"] == "Ivan"
+
+
 async def test_get_user_id_validation_error(
     client: TestClient, create_user_in_database, get_user_from_database
 ):
@@ -0,0 +1,18 @@
+from fastapi import status
+from starlette.testclient import TestClient
+
+
+async def test_live(client: TestClient):
+    resp = client.get("/health/live")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"status": "alive"}
+
+
+async def test_ready_reflects_app_state(client: TestClient):
+    client.app.state.ready = False
+    resp = client.get("/health/ready")
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    client.app.state.ready = True
+    resp = client.get("/health/ready")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"status": "ready"}
@@ -0,0 +1,119 @@
+from uuid import uuid4
+
+from fastapi import status
+from starlette.testclient import TestClient
+
+from api.jobs import JobWorkerPool
+from db.jobs import JobDAL
+from tests.conftest import create_sample_user
+from tests.conftest import create_test_auth_headers_for_user
+
+
+def make_pool(async_session_test) -> JobWorkerPool:
+    return JobWorkerPool(
+        concurrency=1,
+        poll_interval=60,
+        lease=60,
+        retry_delay=0,
+        session_factory=lambda: async_session_test,
+    )
+
+
+async def test_deactivate_users_job(
+    client: TestClient,
+    create_user_in_database,
+    get_user_from_database,
+    async_session_test,
+):
+    users = [await create_sample_user(create_user_in_database) for _ in range(3)]
+    headers = create_test_auth_headers_for_user(users[0].email)
+    resp = client.post(
+        "/jobs/",
+        json={
+            "job_type": "deactivate_users",
+            "user_ids": [str(user.user_id) for user in users[1:]] + [str(uuid4())],
+        },
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+    job_id = resp.json()["job_id"]
+    assert resp.json()["status"] == "queued"
+
+    assert await make_pool(async_session_test).run_pending() == 1
+
+    resp = client.get(f"/jobs/?job_id={job_id}", headers=headers)
+    assert resp.json()["status"] == "succeeded"
+    assert resp.json()["progress"] == {"processed": 3, "affected": 2}
+    assert resp.json()["attempts"] == 1
+    for user in users:
+        user_from_db = dict((await get_user_from_database(user.user_id))[0])
+        assert user_from_db["is_active"] is (user is users[0])
+
+
+async def test_update_users_job(
+    client: TestClient,
+    create_user_in_database,
+    get_user_from_database,
+    async_session_test,
+):
+    user = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user.email)
+    resp = client.post(
+        "/jobs/",
+        json={
+            "job_type": "update_users",
+            "user_ids": [str(user.user_id)],
+            "changes": {"surname": "Renamed"},
+        },
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+
+    assert await make_pool(async_session_test).run_pending() == 1
+
+    user_from_db = dict((await get_user_from_database(user.user_id))[0])
+    assert user_from_db["surname"] == "Renamed"
+
+
+async def test_failed_job_is_retried(
+    client: TestClient, create_user_in_database, async_session_test
+):
+    user = await create_sample_user(create_user_in_database)
+    async with async_session_test() as session, session.begin():
+        job = await JobDAL(session).submit_job(
+            "deactivate_users", {"user_ids": ["not-a-uuid"]}, max_attempts=3
+        )
+
+    # every attempt fails, until the job runs out of them
+    assert await make_pool(async_session_test).run_pending() == 3
+
+    resp = client.get(
+        f"/jobs/?job_id={job.job_id}",
+        headers=create_test_auth_headers_for_user(user.email),
+    )
+    assert resp.json()["status"] == "failed"
+    assert resp.json()["attempts"] == 3
+    assert "UUID" in resp.json()["error"]
+
+
+async def test_submit_job_validation(client: TestClient, create_user_in_database):
+    user = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user.email)
+    resp = client.post(
+        "/jobs/",
+        json={"job_type": "update_users", "user_ids": [str(user.user_id)]},
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    resp = client.post(
+        "/jobs/",
+        json={
+            "job_type": "update_users",
+            "user_ids": [str(user.user_id)],
+            "changes": {"email": "same@for.all"},
+        },
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    resp = client.get(f"/jobs/?job_id={uuid4()}", headers=headers)
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
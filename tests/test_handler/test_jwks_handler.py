@@ -0,0 +1,13 @@
+from fastapi import status
+from starlette.testclient import TestClient
+
+
+async def test_jwks_is_cacheable(client: TestClient):
+    resp = client.get("/.well-known/jwks.json")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"keys": []}
+    assert resp.headers["Cache-Control"].startswith("public, max-age=")
+    resp = client.get(
+        "/.well-known/jwks.json", headers={"If-None-Match": resp.headers["ETag"]}
+    )
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
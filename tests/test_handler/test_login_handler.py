@@ -0,0 +1,69 @@
+from fastapi import status
+from starlette.testclient import TestClient
+
+from db.login_tracker import last_login_tracker
+from db.login_tracker import LastLoginTracker
+from security import create_access_token
+from tests.conftest import create_sample_user
+from tests.conftest import create_test_auth_headers_for_user
+
+
+async def test_login_for_access_token(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    resp = client.post(
+        "/login/token",
+        data={"username": user_data.email, "password": user_data.hashed_password},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["token_type"] == "bearer"
+    assert user_data.user_id in last_login_tracker._pending
+
+
+async def test_login_wrong_password(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    resp = client.post(
+        "/login/token",
+        data={"username": user_data.email, "password": "WrongPass"},
+    )
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+    assert resp.json() == {"detail": "Incorrect username or password."}
+
+
+async def test_last_login_tracker_flush(
+    async_session_test, create_user_in_database, get_user_from_database
+):
+    user_data = await create_sample_user(create_user_in_database)
+    tracker = LastLoginTracker(
+        max_size=10, flush_interval=60, session_factory=lambda: async_session_test
+    )
+    tracker.record(user_data.user_id)
+    assert await tracker.flush() == 1
+    users_from_db = await get_user_from_database(user_data.user_id)
+    assert users_from_db[0]["last_login_at"] is not None
+    assert await tracker.flush() == 0
+
+
+async def test_introspect_tokens(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    valid_token = create_access_token(data={"sub": user_data.email})
+    unknown_user_token = create_access_token(data={"sub": "nobody@boba.com"})
+    resp = client.post(
+        "/login/introspect",
+        json={"tokens": [valid_token, "garbage", unknown_user_token, valid_token]},
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    tokens = resp.json()["tokens"]
+    assert [token["active"] for token in tokens] == [True, False, False, True]
+    assert tokens[0]["sub"] == user_data.email
+    assert tokens[0]["exp"] is not None
+    assert tokens[1] == {"active": False, "sub": None, "exp": None}
+
+
+async def test_introspect_tokens_unauth(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    resp = client.post(
+        "/login/introspect",
+        json={"tokens": [create_access_token(data={"sub": user_data.email})]},
+    )
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,59 @@
+from fastapi import status
+from starlette.testclient import TestClient
+
+from db.stats_reconciler import UserStatsReconciler
+from tests.conftest import create_sample_user
+from tests.conftest import create_test_auth_headers_for_user
+
+
+async def test_get_user_stats(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    resp = client.post(
+        "/user/",
+        json={
+            "name": "Nikolai",
+            "surname": "Sviridov",
+            "email": "lol@kek.com",
+            "password": "SamplePass1!",
+        },
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    resp = client.delete(f"/user/?user_id={resp.json()['user_id']}", headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+
+    resp = client.get("/user/stats", headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+    # the user inserted past the DAL is not counted until a reconciliation
+    assert resp.json() == {"total": 1, "active": 0, "inactive": 1, "estimated": False}
+
+
+async def test_reconcile_user_stats(
+    client: TestClient, create_user_in_database, async_session_test
+):
+    user_data = await create_sample_user(create_user_in_database)
+    headers = create_test_auth_headers_for_user(user_data.email)
+    reconciler = UserStatsReconciler(
+        interval=60, session_factory=lambda: async_session_test
+    )
+
+    assert await reconciler.reconcile()
+
+    resp = client.get("/user/stats", headers=headers)
+    assert resp.json() == {"total": 1, "active": 1, "inactive": 0, "estimated": False}
+
+
+async def test_estimate_user_stats(client: TestClient, create_user_in_database):
+    user_data = await create_sample_user(create_user_in_database)
+    resp = client.get(
+        "/user/stats?estimate=true",
+        headers=create_test_auth_headers_for_user(user_data.email),
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["estimated"] is True
+    assert resp.json()["total"] >= 0
+
+
+async def test_get_user_stats_unauthorized(client: TestClient):
+    resp = client.get("/user/stats")
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,88 @@
+import json
+
+import settings
+from hashing import Hasher
+from import_users import import_users
+
+TEST_DSN = "".join(settings.TEST_DATABASE_URL.split("+asyncpg"))
+
+
+async def test_import_users_from_csv(tmp_path, asyncpg_pool):
+    source = tmp_path / "users.csv"
+    source.write_text(
+        "name,surname,email,password\n"
+        "Boba,Bobenko,boba@boba.com,SamplePass1!\n"
+        "B0ba,Bobenko,broken@boba.com,SamplePass1!\n"
+        "Biba,Bibenko,biba@biba.com,SamplePass1!\n"
+        "Boba,Twice,boba@boba.com,SamplePass1!\n"
+    )
+    checkpoint = tmp_path / "users.csv.checkpoint"
+    options = dict(
+        path=str(source),
+        dsn=TEST_DSN,
+        file_format="csv",
+        checkpoint_path=str(checkpoint),
+        batch_size=2,
+        workers=2,
+        pre_hashed=False,
+    )
+
+    stats = await import_users(**options)
+
+    assert (stats.imported, stats.duplicates, stats.rejected) == (2, 1, 1)
+    assert json.loads(checkpoint.read_text())["rows"] == 4
+    async with asyncpg_pool.acquire() as connection:
+        users = await connection.fetch("SELECT * FROM users ORDER BY email")
+        counters = await connection.fetchval(
+            "SELECT sum(total) FROM user_stats_counters"
+        )
+    assert [user["email"] for user in users] == ["biba@biba.com", "boba@boba.com"]
+    assert users[1]["surname"] == "Bobenko"
+    assert Hasher.verify_password("SamplePass1!", users[0]["hashed_password"])
+    assert counters == 2
+
+    # an import resumed from the checkpoint has nothing left to do
+    stats = await import_users(**options)
+    assert (stats.imported, stats.duplicates, stats.rejected) == (0, 0, 0)
+
+
+async def test_import_pre_hashed_users_from_ndjson(tmp_path, asyncpg_pool):
+    hashed_password = Hasher.get_password_hash("SamplePass1!")
+    source = tmp_path / "users.ndjson"
+    source.write_text(
+        json.dumps(
+            {
+                "name": "Boba",
+                "surname": "Bobenko",
+                "email": "boba@boba.com",
+                "hashed_password": hashed_password,
+            }
+        )
+        + "\n"
+        + json.dumps(
+            {
+                "name": "Biba",
+                "surname": "Bibenko",
+                "email": "biba@biba.com",
+                "hashed_password": "plain-text",
+            }
+        )
+        + "\n"
+    )
+
+    stats = await import_users(
+        path=str(source),
+        dsn=TEST_DSN,
+        file_format="ndjson",
+        checkpoint_path=str(tmp_path / "checkpoint"),
+        batch_size=100,
+        workers=1,
+        pre_hashed=True,
+    )
+
+    assert (stats.imported, stats.duplicates, stats.rejected) == (1, 0, 1)
+    async with asyncpg_pool.acquire() as connection:
+        stored_hash = await connection.fetchval(
+            "SELECT hashed_password FROM users WHERE email = 'boba@boba.com'"
+        )
+    assert stored_hash == hashed_password
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import status
+from starlette.testclient import TestClient
+
+from db.memory import get_in_memory_db
+from db.memory import in_memory_user_store
+from db.memory import InMemoryUserDAL
+from db.memory import InMemoryUserStore
+from db.session import get_db
+from main import app
+from tests.conftest import create_test_auth_headers_for_user
+
+
+@pytest.fixture
+def in_memory_client():
+    app.dependency_overrides[get_db] = get_in_memory_db
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.pop(get_db)
+    in_memory_user_store.clear()
+
+
+async def test_in_memory_dal_keeps_emails_unique():
+    user_dal = InMemoryUserDAL(InMemoryUserStore())
+    user = await user_dal.create_user("Boba", "Bobenko", "boba@boba.com", "hash")
+    assert await user_dal.create_user("Alice", "W", "boba@boba.com", "hash") is None
+    assert await user_dal.get_user_by_email("boba@boba.com") is user
+    _, version = await user_dal.get_user_with_version_by_id(user.user_id)
+    assert await user_dal.update_user(user.user_id, email="new@boba.com")
+    assert await user_dal.get_user_by_email("boba@boba.com") is None
+    assert (await user_dal.get_user_with_version_by_id(user.user_id))[1] > version
+    assert await user_dal.delete_user(user.user_id) == user.user_id
+    assert await user_dal.delete_user(user.user_id) is None
+    assert await user_dal.get_user_stats() == (1, 0)
+
+
+async def test_in_memory_dal_archives_inactive_users():
+    user_dal = InMemoryUserDAL(InMemoryUserStore())
+    user = await user_dal.create_user("Boba", "Bobenko", "boba@boba.com", "hash")
+    assert await user_dal.archive_inactive_users(timedelta(0), 10) == 0
+    await user_dal.delete_user(user.user_id)
+    assert await user_dal.archive_inactive_users(timedelta(days=1), 10) == 0
+    assert await user_dal.archive_inactive_users(timedelta(0), 10) == 1
+    assert user_dal.store.users == {}
+    assert await user_dal.get_user_by_id(user.user_id) is user
+    assert await user_dal.get_user_by_email("boba@boba.com") is None
+    assert await user_dal.get_user_stats() == (1, 0)
+
+
+async def test_api_served_from_memory(in_memory_client: TestClient):
+    user_data = {
+        "name": "Boba",
+        "surname": "Bobenko",
+        "email": "boba@boba.com",
+        "password": "SamplePass1!",
+    }
+    resp = in_memory_client.post("/user/", json=user_data)
+    assert resp.status_code == status.HTTP_200_OK
+    user_id = resp.json()["user_id"]
+    resp = in_memory_client.post("/user/", json=user_data)
+    assert resp.status_code == status.HTTP_409_CONFLICT
+    resp = in_memory_client.get(
+        f"/user/?user_id={user_id}",
+        headers=create_test_auth_headers_for_user(user_data["email"]),
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["email"] == user_data["email"]
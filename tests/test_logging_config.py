@@ -0,0 +1,36 @@
+import logging
+from queue import Queue
+
+from logging_config import dropped_records
+from logging_config import DroppingQueueHandler
+from logging_config import parse_mapping
+from logging_config import SamplingFilter
+
+
+def make_record(name: str) -> logging.LogRecord:
+    return logging.LogRecord(name, logging.INFO, __file__, 1, "message %s", (1,), None)
+
+
+def test_parse_mapping():
+    assert parse_mapping("sqlalchemy.engine=0.01, api = 1,") == {
+        "sqlalchemy.engine": "0.01",
+        "api": "1",
+    }
+    assert parse_mapping("") == {}
+
+
+def test_sampling_filter_applies_to_child_loggers():
+    sampling_filter = SamplingFilter({"sqlalchemy": 0.0, "sqlalchemy.pool": 1.0})
+    assert not sampling_filter.filter(make_record("sqlalchemy.engine.Engine"))
+    assert sampling_filter.filter(make_record("sqlalchemy.pool.impl"))
+    assert sampling_filter.filter(make_record("api.actions.auth"))
+
+
+def test_queue_handler_drops_records_when_full():
+    handler = DroppingQueueHandler(Queue(maxsize=1))
+    dropped_before = dropped_records.get()
+    handler.handle(make_record("api"))
+    handler.handle(make_record("api"))
+    assert handler.queue.qsize() == 1
+    assert handler.queue.get_nowait().getMessage() == "message 1"
+    assert dropped_records.get() == dropped_before + 1
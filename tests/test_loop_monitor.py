@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import time
+
+from loop_monitor import EventLoopMonitor
+from loop_monitor import loop_blocked
+from loop_monitor import loop_lag_seconds
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def test_blocking_call_is_logged_with_its_stack(caplog):
+    monitor = EventLoopMonitor(interval=0.01, threshold=0.05)
+    blocked = loop_blocked.get()
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger="loop_monitor"):
+            block_the_loop(0.3)
+            await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+    # a stall is reported once however long it lasts
+    assert loop_blocked.get() == blocked + 1
+    [record] = caplog.records
+    assert "Event loop blocked" in record.getMessage()
+    assert "block_the_loop" in record.getMessage()
+    assert loop_lag_seconds.values[()][1][1] >= 0.2
+
+
+async def test_idle_loop_is_not_reported():
+    monitor = EventLoopMonitor(interval=0.01, threshold=0.5)
+    blocked = loop_blocked.get()
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+    finally:
+        await monitor.stop()
+    assert loop_blocked.get() == blocked
@@ -0,0 +1,43 @@
+import os
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from api.middlewares.profiling import ProfilingMiddleware
+
+
+def make_client(directory: str, **kwargs) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "pong"}
+
+    app.add_middleware(ProfilingMiddleware, directory=directory, **kwargs)
+    return TestClient(app)
+
+
+def test_profiling_requested_by_header(tmp_path):
+    client = make_client(str(tmp_path), max_files=10, token="secret")
+    resp = client.get("/ping")
+    assert "X-Profile-Id" not in resp.headers
+    assert os.listdir(tmp_path) == []
+    resp = client.get("/ping", headers={"X-Profile": "secret"})
+    profile_id = resp.headers["X-Profile-Id"]
+    assert sorted(os.listdir(tmp_path)) == [f"{profile_id}.pstats", f"{profile_id}.txt"]
+
+
+def test_profiling_wrong_token(tmp_path):
+    client = make_client(str(tmp_path), max_files=10, token="secret")
+    resp = client.get("/ping", headers={"X-Profile": "guess"})
+    assert "X-Profile-Id" not in resp.headers
+
+
+def test_profiling_keeps_bounded_directory(tmp_path):
+    client = make_client(str(tmp_path), max_files=2, sample_rate=1.0)
+    profile_ids = [client.get("/ping").headers["X-Profile-Id"] for _ in range(4)]
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        f"{profile_id}{suffix}"
+        for profile_id in profile_ids[2:]
+        for suffix in (".pstats", ".txt")
+    )
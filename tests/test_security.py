@@ -0,0 +1,75 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import JWTError
+
+import settings
+from security import create_access_token
+from security import decode_access_token
+from security import get_jwks
+from security import get_signing_keys
+
+
+def write_private_key(path, algorithm: str) -> str:
+    if algorithm.startswith("RS"):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        key = ec.generate_private_key(ec.SECP256R1())
+    path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(path)
+
+
+@pytest.fixture
+def use_algorithm(monkeypatch, tmp_path):
+    def use_algorithm(algorithm: str, key_id: str, retired: str = "") -> str:
+        key_file = write_private_key(tmp_path / f"{key_id}.pem", algorithm)
+        monkeypatch.setattr(settings, "ALGORITHM", algorithm)
+        monkeypatch.setattr(settings, "JWT_PRIVATE_KEY_FILE", key_file)
+        monkeypatch.setattr(settings, "JWT_KEY_ID", key_id)
+        monkeypatch.setattr(settings, "JWT_RETIRED_PUBLIC_KEY_FILES", retired)
+        get_signing_keys.cache_clear()
+        return key_file
+
+    yield use_algorithm
+    get_signing_keys.cache_clear()
+
+
+@pytest.mark.parametrize("algorithm", ["RS256", "ES256"])
+def test_asymmetric_token_roundtrip(use_algorithm, algorithm):
+    use_algorithm(algorithm, "key-1")
+    token = create_access_token(data={"sub": "boba@boba.com"})
+    assert decode_access_token(token)["sub"] == "boba@boba.com"
+    [public_key] = get_jwks()["keys"]
+    assert public_key["kid"] == "key-1"
+    assert public_key["alg"] == algorithm
+    assert "d" not in public_key
+
+
+def test_key_rotation_keeps_retired_key_valid(use_algorithm):
+    old_key_file = use_algorithm("RS256", "key-1")
+    old_token = create_access_token(data={"sub": "boba@boba.com"})
+    use_algorithm("RS256", "key-2", retired=f"key-1={old_key_file}")
+    assert decode_access_token(old_token)["sub"] == "boba@boba.com"
+    assert [key["kid"] for key in get_jwks()["keys"]] == ["key-2", "key-1"]
+    use_algorithm("RS256", "key-3")
+    with pytest.raises(JWTError):
+        decode_access_token(old_token)
+
+
+def test_unsupported_algorithm(use_algorithm, monkeypatch):
+    use_algorithm("RS256", "key-1")
+    monkeypatch.setattr(settings, "ALGORITHM", "EdDSA")
+    get_signing_keys.cache_clear()
+    with pytest.raises(ValueError):
+        create_access_token(data={"sub": "boba@boba.com"})
+
+
+def test_jwks_empty_for_hmac():
+    assert get_jwks() == {"keys": []}
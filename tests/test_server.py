@@ -0,0 +1,20 @@
+import pytest
+
+import settings
+from server import get_pool_sizing
+
+
+def test_pool_sizing_fits_connection_budget(monkeypatch):
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 100)
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+    pool_size, max_overflow = get_pool_sizing(workers=8)
+    assert pool_size == 5
+    assert max_overflow == 6
+    assert (pool_size + max_overflow + 1) * 8 <= 100
+
+
+def test_pool_sizing_rejects_too_many_workers(monkeypatch):
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 10)
+    with pytest.raises(ValueError):
+        get_pool_sizing(workers=8)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from api.middlewares.server_timing import ServerTimingMiddleware
+from api.middlewares.server_timing import ServerTimingRoute
+from api.middlewares.server_timing import timed
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(route_class=ServerTimingRoute)
+
+    @router.get("/ping")
+    async def ping():
+        with timed("db"):
+            pass
+        return {"status": "pong"}
+
+    app.include_router(router)
+    return app
+
+
+def test_server_timing_header():
+    app = make_app()
+    app.add_middleware(ServerTimingMiddleware)
+    resp = TestClient(app).get("/ping")
+    assert resp.json() == {"status": "pong"}
+    phases = [
+        metric.split(";")[0] for metric in resp.headers["Server-Timing"].split(", ")
+    ]
+    assert phases == ["db", "serialize", "total"]
+
+
+def test_server_timing_disabled():
+    resp = TestClient(make_app()).get("/ping")
+    assert resp.json() == {"status": "pong"}
+    assert "Server-Timing" not in resp.headers
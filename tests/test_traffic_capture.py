@@ -0,0 +1,70 @@
+import httpx
+from fastapi import FastAPI
+from pydantic import BaseModel
+from starlette.testclient import TestClient
+
+from api.middlewares.traffic_capture import pseudonymize_email
+from api.middlewares.traffic_capture import REDACTED
+from api.middlewares.traffic_capture import TrafficCaptureMiddleware
+from api.middlewares.traffic_capture import TrafficRecorder
+from replay_traffic import read_capture
+from replay_traffic import replay
+from replay_traffic import report
+
+
+class Signup(BaseModel):
+    email: str
+    password: str
+
+
+def make_app(recorder: TrafficRecorder) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/signup")
+    async def signup(body: Signup):
+        return {"email": body.email, "password_length": len(body.password)}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        TrafficCaptureMiddleware,
+        recorder=recorder,
+        sample_rate=1.0,
+        max_body_bytes=1024,
+        exempt=["/health"],
+    )
+    return app
+
+
+async def test_capture_and_replay(tmp_path):
+    capture_path = tmp_path / "traffic.ndjson"
+    recorder = TrafficRecorder(str(capture_path), queue_size=100)
+    recorder.start()
+    app = make_app(recorder)
+    client = TestClient(app)
+    client.post(
+        "/signup",
+        json={"email": "boba@boba.com", "password": "secret"},
+        headers={"Authorization": "Bearer abc"},
+    )
+    client.get("/health")
+    recorder.stop()
+
+    entries = read_capture(str(capture_path))
+    assert len(entries) == 1
+    entry = entries[0]
+    assert entry["method"] == "POST" and entry["status"] == 200
+    assert entry["body"] == {
+        "email": pseudonymize_email("boba@boba.com"),
+        "password": REDACTED,
+    }
+    assert entry["authorized"] is True
+    assert "abc" not in capture_path.read_text()
+    assert "boba@boba.com" not in capture_path.read_text()
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as replay_client:
+        results = await replay(entries, replay_client, speed=10, password="replayed")
+    assert [result.status for result in results] == [200]
+    assert "POST /signup" in report(results)